@@ -0,0 +1,459 @@
+# Benchmarki przetwarzania zastępstw działające bez połączenia ze stroną szkoły
+# Uruchomienie:
+#   python benchmark.py parsery [--wiersze 100 1000 10000] [--powtorzenia 5]
+#   python benchmark.py etapy [--wiersze 10 100 1000 10000] [--zapisz | --porownaj [--tolerancja 0.25]]
+#   python benchmark.py shardy [--serwery 40] [--shardy 4] [--procesy 2] [--wiersze 200]
+#   python benchmark.py pamiec [--serwery 10 100] [--czlonkowie 100 1000] [--wiadomosci 20]
+
+# Standardowe biblioteki Pythona
+import argparse
+import asyncio
+import contextvars
+import gc
+import itertools
+import json
+import multiprocessing
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+from aiohttp import web
+
+# main.py wczytuje config.json podczas importu, dlatego benchmark działa w katalogu tymczasowym z konfiguracją wzorcową
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+WORKING_DIRECTORY = tempfile.mkdtemp(prefix="zastepstwa-benchmark-")
+shutil.copy(os.path.join(REPOSITORY_DIRECTORY, "config-pattern.json"), os.path.join(WORKING_DIRECTORY, "config.json"))
+os.chdir(WORKING_DIRECTORY)
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+import main
+
+main.console_logger.setLevel(logging.WARNING)
+
+# Generowanie strony w formacie Zastępstw Optivum
+TEACHER_NAMES = ["Kowalska Anna", "Nowak Piotr", "Wiśniewski Łukasz", "Wójcik Małgorzata", "Kamińska Żaneta", "Lewandowski Józef", "Zieliński Grzegorz", "Szymańska Bożena"]
+SUBJECTS = ["matematyka", "język polski", "fizyka", "geografia", "wychowanie fizyczne", "informatyka", "chemia", "język angielski"]
+
+def generate_page(rows, seed=0):
+	generator = random.Random(seed)
+	classes = [cls for grade_classes in main.classes_by_grade.values() for cls in grade_classes]
+	lines = [
+		"<html><head><meta http-equiv=\"Content-Type\" content=\"text/html; charset=iso-8859-2\"><title>Zastępstwa</title></head><body>",
+		"<table border=\"0\" cellpadding=\"0\" cellspacing=\"0\">",
+		"<tr><td class=\"st0\" align=\"LEFT\">Zmiana organizacji zajęć w dniu jutrzejszym.<br>Szczegóły w dzienniku elektronicznym: <a href=\"https://zastepstwa.example.pl/informacje\">informacje</a></td></tr>",
+		"<tr><td nowrap class=\"st1\" align=\"LEFT\" bgcolor=\"#FFFFFF\">Zastępstwa w dniu 18.10.2026 (środa)</td></tr>"
+	]
+
+	written = 0
+	teacher_index = 0
+	while written < rows:
+		teacher = f"{TEACHER_NAMES[teacher_index % len(TEACHER_NAMES)]} ({teacher_index + 1})"
+		teacher_index += 1
+		lines.append(f"<tr><td nowrap class=\"st3\" align=\"LEFT\" bgcolor=\"{main.TEACHERS_CELL_COLOR}\">{teacher}</td></tr>")
+		lines.append("<tr><td nowrap class=\"st4\">lekcja</td><td nowrap class=\"st4\">opis</td><td nowrap class=\"st4\">zastępca</td><td nowrap class=\"st4\">uwagi</td></tr>")
+
+		for _ in range(min(generator.randint(2, 8), rows - written)):
+			lesson = generator.randint(0, 10)
+			subject = generator.choice(SUBJECTS)
+			kind = generator.random()
+			if kind < 0.7:
+				description = f"{generator.choice(classes)} - {subject}, s. {generator.randint(1, 40)}"
+			elif kind < 0.85:
+				description = f"{generator.choice(classes)}(1/2) - {subject}"
+			else:
+				description = f"zajęcia pozalekcyjne - {subject}"
+			substitute = generator.choice(["", generator.choice(TEACHER_NAMES)])
+			notes = generator.choice(["", "uczniowie zwolnieni do domu", "przeniesiona", "zajęcia odwołane"])
+			lines.append(f"<tr><td nowrap class=\"st5\">{lesson}</td><td class=\"st6\">{description}</td><td nowrap class=\"st7\">{substitute}</td><td class=\"st8\">{notes}</td></tr>")
+			written += 1
+
+	lines.append("</table>")
+	lines.append("<p class=\"op\">wygenerowano 18.10.2026 o 07:40:12 za pomocą programu <a href=\"http://www.vulcan.edu.pl/dla_szkol/optivum/zastepstwa/Strony/wstep.aspx\">Zastępstwa Optivum</a> firmy <a href=\"http://www.vulcan.edu.pl/\">VULCAN</a></p>")
+	lines.append("</body></html>")
+	return "\n".join(lines).encode(main.ENCODING)
+
+# Pomiary
+def measure_time(function, repeats):
+	best = None
+	for _ in range(repeats):
+		start = time.perf_counter()
+		function()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def measure_peak_memory(function):
+	tracemalloc.start()
+	try:
+		function()
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	return peak
+
+def available_parser_backends():
+	return [backend for backend in main.PARSER_BACKENDS if main.resolve_parser_backend(backend) == backend]
+
+def benchmark_parser_backends(sizes, repeats):
+	backends = available_parser_backends()
+	print(f"{'wiersze':>8}  {'sposób przetwarzania':<22}{'czas [ms]':>11}{'pamięć [KiB]':>14}  zgodność")
+	for rows in sizes:
+		text = generate_page(rows).decode(main.ENCODING)
+		reference = main.extract_data_from_html(main.parse_website_content(text, "html.parser"))
+		for backend in backends:
+			def parse():
+				return main.extract_data_from_html(main.parse_website_content(text, backend))
+			elapsed = measure_time(parse, repeats)
+			peak = measure_peak_memory(parse)
+			identical = "tak" if parse() == reference else "NIE"
+			print(f"{rows:>8}  {backend:<22}{elapsed * 1000:>11.1f}{peak / 1024:>14.0f}  {identical}")
+
+# Etapy przetwarzania aktualizacji
+BASELINE_PATH = os.path.join(REPOSITORY_DIRECTORY, "benchmark_baseline.json")
+FILTER_CLASSES = ["1 A", "2 B", "3 D"]
+MINIMUM_TIME_DIFFERENCE_MS = 1.0	# Różnice czasu mniejsze niż ta wartość nie są uznawane za regresje, ponieważ mieszczą się w szumie pomiarowym.
+
+def prepare_stages(rows):
+	body = generate_page(rows)
+	text = body.decode(main.ENCODING)
+	parsed = main.extract_data_from_html(main.parse_website_content(text))
+	entries, no_class_entries_by_teacher = main.filter_entries(parsed, FILTER_CLASSES)
+	blocks = main.build_blocks(entries, no_class_entries_by_teacher)
+
+	# Poprzedni stan pochodzi z tej samej strony z jedną zmienioną uwagą, tak jak przy typowej poprawce
+	previous_parsed = main.extract_data_from_html(main.parse_website_content(text.replace("zajęcia odwołane", "zajęcia przeniesione", 1)))
+	previous_entries, previous_no_class_entries_by_teacher = main.filter_entries(previous_parsed, FILTER_CLASSES)
+	previous_state = main.build_state(previous_parsed.additional_info, previous_entries, previous_no_class_entries_by_teacher, main.build_blocks(previous_entries, previous_no_class_entries_by_teacher))
+
+	def detect_changes():
+		current_blocks = main.build_blocks(entries, no_class_entries_by_teacher)
+		current_state = main.build_state(parsed.additional_info, entries, no_class_entries_by_teacher, current_blocks)
+		return main.diff_states(previous_state, current_state)
+
+	def build_embeds():
+		embeds = []
+		for kind, title, block_entries in blocks.values():
+			embeds.extend(main.build_block_embeds(kind, title, block_entries))
+		return main.pack_embeds(embeds)
+
+	return {
+		"dekodowanie": lambda: body.decode(main.ENCODING),
+		"odcisk strony": lambda: main.calculate_snapshot_fingerprint(text),
+		"przetwarzanie": lambda: main.extract_data_from_html(main.parse_website_content(text)),
+		"filtrowanie": lambda: main.filter_entries(parsed, FILTER_CLASSES),
+		"filtrowanie (wszystkie)": lambda: main.filter_entries(parsed, []),
+		"wykrywanie zmian": detect_changes,
+		"embedy": build_embeds
+	}
+
+def benchmark_stages(sizes, repeats):
+	results = {}
+	print(f"{'wiersze':>8}  {'etap':<26}{'czas [ms]':>11}{'pamięć [KiB]':>14}")
+	for rows in sizes:
+		results[str(rows)] = {}
+		for stage, function in prepare_stages(rows).items():
+			elapsed = measure_time(function, repeats)
+			peak = measure_peak_memory(function)
+			results[str(rows)][stage] = {"time_ms": round(elapsed * 1000, 3), "peak_kib": round(peak / 1024, 1)}
+			print(f"{rows:>8}  {stage:<26}{elapsed * 1000:>11.2f}{peak / 1024:>14.0f}")
+	return results
+
+def compare_with_baseline(results, tolerance):
+	if not os.path.exists(BASELINE_PATH):
+		print(f"Brak pliku z wynikami bazowymi ({BASELINE_PATH}). Utwórz go, używając opcji --zapisz.")
+		return False
+
+	with open(BASELINE_PATH, "r", encoding="utf-8") as file:
+		baseline = json.load(file)
+
+	regressions = []
+	for rows, stages in results.items():
+		for stage, result in stages.items():
+			reference = baseline.get(rows, {}).get(stage)
+			if reference is None:
+				continue
+			for metric in ("time_ms", "peak_kib"):
+				if metric == "time_ms" and result[metric] - reference[metric] < MINIMUM_TIME_DIFFERENCE_MS:
+					continue
+				if result[metric] > reference[metric] * (1 + tolerance):
+					regressions.append(f"{rows} wierszy, {stage}: {metric} {result[metric]} (wynik bazowy: {reference[metric]})")
+
+	if regressions:
+		print(f"\nWykryto regresje (tolerancja {tolerance:.0%}):")
+		for regression in regressions:
+			print(f"  {regression}")
+		return False
+	print(f"\nBrak regresji względem wyników bazowych (tolerancja {tolerance:.0%}).")
+	return True
+
+# Symulacja trybu z shardami z fałszywą bramą Discorda
+delivering_process = contextvars.ContextVar("delivering_process", default=None)
+message_ids = itertools.count(1)
+
+class FakeMessage:
+	def __init__(self, channel):
+		self.channel = channel
+		self.id = next(message_ids)
+
+	async def edit(self, **kwargs):
+		self.channel.record("edit")
+		return self
+
+	async def delete(self, delay=None):
+		self.channel.record("delete")
+
+	async def add_reaction(self, emoji):
+		pass
+
+class FakeChannel:
+	def __init__(self, guild_id):
+		self.id = guild_id
+		self.guild_id = guild_id
+		self.operations = []
+
+	def record(self, operation):
+		self.operations.append((delivering_process.get(), operation))
+
+	async def send(self, content=None, **kwargs):
+		self.record("send")
+		return FakeMessage(self)
+
+	def get_partial_message(self, message_id):
+		return FakeMessage(self)
+
+class FakeGateway:
+	# Zastępuje połączenie z Discordem: kanały serwerów zapisują wykonane na nich operacje wraz z procesem, który je wykonał
+	def __init__(self):
+		self.channels = {}
+
+	def get_channel(self, channel_id):
+		return self.channels.get(channel_id)
+
+class SimulatedShardProcess(main.UpdateSubscriber):
+	def __init__(self, host, port, name):
+		super().__init__(host, port)
+		self.name = name
+
+	async def deliver(self, message, shard_ids, shard_count):
+		delivering_process.set(self.name)
+		return await super().deliver(message, shard_ids, shard_count)
+
+async def simulate_shards(guild_count, shard_count, process_count, rows):
+	# Strona szkoły serwowana lokalnie
+	pages = {"text": generate_page(rows)}
+	async def handle_page(request):
+		return web.Response(body=pages["text"])
+	application = web.Application()
+	application.router.add_get("/", handle_page)
+	page_runner = web.AppRunner(application, access_log=None)
+	await page_runner.setup()
+	await web.TCPSite(page_runner, "127.0.0.1", 0).start()
+	page_port = page_runner.addresses[0][1]
+	main.sources.clear()
+	main.sources[main.DEFAULT_SOURCE] = main.Source(main.DEFAULT_SOURCE, {**main.SOURCES[main.DEFAULT_SOURCE], "url": f"http://127.0.0.1:{page_port}/"})
+
+	# Serwery o ID rozłożonych na wszystkie shardy
+	gateway = FakeGateway()
+	main.bot.get_channel = gateway.get_channel
+	for index in range(guild_count):
+		guild_id = (1_000_000 + index) << 22 | index
+		main.config_service.add_guild(guild_id)
+		main.config_service.set_channel(guild_id, guild_id)
+		gateway.channels[guild_id] = FakeChannel(guild_id)
+	main.state_store.open()
+
+	publisher = main.UpdatePublisher("127.0.0.1", 0)
+	await publisher.start()
+	publisher_port = publisher.server.sockets[0].getsockname()[1]
+	main.update_publisher = publisher
+
+	shard_ranges = [list(range(shard_count))[index::process_count] for index in range(process_count)]
+	processes = [SimulatedShardProcess("127.0.0.1", publisher_port, f"proces {index}") for index in range(process_count)]
+	tasks = [asyncio.create_task(process.run(shard_ids, shard_count)) for process, shard_ids in zip(processes, shard_ranges)]
+	while len(publisher.shards) < process_count:
+		await asyncio.sleep(0.01)
+
+	print(f"{'cykl':<28}{'czas [ms]':>11}{'operacje':>10}")
+	timings = []
+	for label, change in (("pierwsze wysłanie", None), ("bez zmian", None), ("zmiana jednego wpisu", ("zajęcia odwołane", "zajęcia przeniesione"))):
+		if change:
+			pages["text"] = pages["text"].decode(main.ENCODING).replace(*change, 1).encode(main.ENCODING)
+		before = sum(len(channel.operations) for channel in gateway.channels.values())
+		start = time.perf_counter()
+		await main.run_update_cycle()
+		elapsed = time.perf_counter() - start
+		operations = sum(len(channel.operations) for channel in gateway.channels.values()) - before
+		timings.append(elapsed)
+		print(f"{label:<28}{elapsed * 1000:>11.1f}{operations:>10}")
+
+	for task in tasks:
+		task.cancel()
+	await publisher.close()
+	await main.http_session.close()
+	await page_runner.cleanup()
+	main.parsing_service.shutdown()
+
+	# Każdy serwer obsługuje wyłącznie proces, do którego należy jego shard
+	errors = []
+	for guild_id, channel in gateway.channels.items():
+		owner = next(process.name for process, shard_ids in zip(processes, shard_ranges) if main.get_shard_id(guild_id, shard_count) in shard_ids)
+		processes_used = {process_name for process_name, _ in channel.operations}
+		if processes_used != {owner}:
+			errors.append(f"serwer {guild_id}: operacje procesów {sorted(map(str, processes_used))}, oczekiwano {owner}")
+	print(f"\nSerwery: {guild_count}, shardy: {shard_count}, procesy: {process_count}.")
+	if errors:
+		print("Wykryto serwery obsłużone przez niewłaściwy proces:")
+		for error in errors:
+			print(f"  {error}")
+		return False
+	print("Każdy serwer otrzymał zastępstwa wyłącznie od procesu obsługującego jego shard.")
+	return True
+
+# Pamięć zajmowana przez dane bramy Discorda
+BOT_USER_ID = 1278769348822962196
+MESSAGE_TIMESTAMP = "2026-10-18T07:40:12+00:00"
+
+def get_resident_memory():
+	# Rozmiar pamięci rezydentnej procesu, dostępny w systemach z /proc
+	try:
+		with open("/proc/self/statm", "r") as file:
+			return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError, AttributeError):
+		return None
+
+def build_user_payload(user_id, bot=False):
+	return {"id": str(user_id), "username": f"uzytkownik{user_id}", "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+
+def build_guild_payload(guild_id, member_count, lean):
+	# Bez intencji członków serwera Discord przesyła wyłącznie członkostwo samego bota
+	members = [{"user": build_user_payload(BOT_USER_ID, bot=True), "roles": [], "joined_at": MESSAGE_TIMESTAMP, "deaf": False, "mute": False, "flags": 0}]
+	if not lean:
+		members.extend({"user": build_user_payload(guild_id * 100_000 + index), "roles": [], "joined_at": MESSAGE_TIMESTAMP, "deaf": False, "mute": False, "flags": 0, "nick": None} for index in range(member_count))
+	return {
+		"id": str(guild_id),
+		"name": f"Serwer {guild_id}",
+		"owner_id": str(guild_id * 100_000),
+		"member_count": member_count + 1,
+		"large": member_count >= 250,
+		"roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+		"channels": [{"id": str(guild_id + 1), "type": 0, "name": "zastepstwa", "position": 0, "permission_overwrites": []}],
+		"members": members,
+		"emojis": [],
+		"stickers": [],
+		"features": []
+	}
+
+def build_message_payload(guild_id, index):
+	return {
+		"id": str(guild_id * 1000 + index),
+		"channel_id": str(guild_id + 1),
+		"guild_id": str(guild_id),
+		"author": build_user_payload(guild_id * 100_000 + index),
+		"content": "Wiadomość na kanale serwera. " * 4,
+		"timestamp": MESSAGE_TIMESTAMP,
+		"edited_timestamp": None,
+		"tts": False,
+		"mention_everyone": False,
+		"mentions": [],
+		"mention_roles": [],
+		"attachments": [],
+		"embeds": [],
+		"pinned": False,
+		"type": 0
+	}
+
+def measure_gateway_memory(lean, guild_count, member_count, message_count, trace):
+	# Zdarzenia bramy trafiają bezpośrednio do stanu połączenia discord.py skonfigurowanego tak jak bot
+	gc.collect()
+	resident_before = get_resident_memory()
+	if trace:
+		tracemalloc.start()
+	client = discord.Client(**main.get_gateway_options(lean))
+	state = client._connection
+	state.user = discord.ClientUser(state=state, data=build_user_payload(BOT_USER_ID, bot=True))
+	for guild_id in range(1, guild_count + 1):
+		state.parse_guild_create(build_guild_payload(guild_id, member_count, lean))
+		for index in range(message_count):
+			state.parse_message_create(build_message_payload(guild_id, index))
+	gc.collect()
+	if trace:
+		traced, _ = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		return traced
+	resident_after = get_resident_memory()
+	resident = resident_after - resident_before if resident_before is not None else None
+	return resident, sum(len(guild.members) for guild in client.guilds), len(client.cached_messages)
+
+def benchmark_gateway_memory(guild_counts, member_counts, message_count):
+	# Każdy pomiar odbywa się w osobnym procesie, aby pamięć poprzednich pomiarów nie zawyżała wyników, a RSS jest mierzony bez narzutu tracemalloc
+	context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+	print(f"{'tryb':<11}{'serwery':>8}{'członkowie':>12}{'pamięć [MiB]':>14}{'RSS [MiB]':>11}{'członkowie w pamięci':>22}{'wiadomości w pamięci':>22}")
+	for lean in (False, True):
+		for guild_count in guild_counts:
+			for member_count in member_counts:
+				arguments = (lean, guild_count, member_count, message_count)
+				if context is not None:
+					with context.Pool(1, maxtasksperchild=1) as pool:
+						resident, cached_members, cached_messages = pool.apply(measure_gateway_memory, (*arguments, False))
+						traced = pool.apply(measure_gateway_memory, (*arguments, True))
+				else:
+					resident, cached_members, cached_messages = measure_gateway_memory(*arguments, False)
+					traced = measure_gateway_memory(*arguments, True)
+				resident_text = f"{resident / 1024 / 1024:.1f}" if resident is not None else "-"
+				print(f"{'oszczędny' if lean else 'pełny':<11}{guild_count:>8}{member_count:>12}{traced / 1024 / 1024:>14.1f}{resident_text:>11}{cached_members:>22}{cached_messages:>22}")
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmarki przetwarzania zastępstw.")
+	subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+	parsers_parser = subparsers.add_parser("parsery", help="Porównanie sposobów przetwarzania strony.")
+	parsers_parser.add_argument("--wiersze", type=int, nargs="+", default=[100, 1000, 10000], help="Liczba wierszy z zastępstwami na wygenerowanych stronach.")
+	parsers_parser.add_argument("--powtorzenia", type=int, default=5, help="Liczba powtórzeń pomiaru czasu (wynikiem jest najlepszy czas).")
+
+	stages_parser = subparsers.add_parser("etapy", help="Pomiar poszczególnych etapów przetwarzania aktualizacji.")
+	stages_parser.add_argument("--wiersze", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Liczba wierszy z zastępstwami na wygenerowanych stronach.")
+	stages_parser.add_argument("--powtorzenia", type=int, default=5, help="Liczba powtórzeń pomiaru czasu (wynikiem jest najlepszy czas).")
+	baseline_group = stages_parser.add_mutually_exclusive_group()
+	baseline_group.add_argument("--zapisz", action="store_true", help="Zapisz wyniki jako wyniki bazowe.")
+	baseline_group.add_argument("--porownaj", action="store_true", help="Porównaj wyniki z wynikami bazowymi.")
+	stages_parser.add_argument("--tolerancja", type=float, default=0.25, help="Dopuszczalny wzrost czasu i pamięci względem wyników bazowych (0.25 oznacza 25%%).")
+
+	shards_parser = subparsers.add_parser("shardy", help="Symulacja trybu z shardami z fałszywą bramą Discorda.")
+	shards_parser.add_argument("--serwery", type=int, default=40, help="Liczba symulowanych serwerów.")
+	shards_parser.add_argument("--shardy", type=int, default=4, help="Całkowita liczba shardów.")
+	shards_parser.add_argument("--procesy", type=int, default=2, help="Liczba procesów shardów, między które rozdzielane są shardy.")
+	shards_parser.add_argument("--wiersze", type=int, default=200, help="Liczba wierszy z zastępstwami na wygenerowanej stronie.")
+
+	memory_parser = subparsers.add_parser("pamiec", help="Pomiar pamięci zajmowanej przez dane bramy Discorda w trybie pełnym i oszczędnym (LEAN_GATEWAY).")
+	memory_parser.add_argument("--serwery", type=int, nargs="+", default=[10, 100], help="Liczba symulowanych serwerów.")
+	memory_parser.add_argument("--czlonkowie", type=int, nargs="+", default=[100, 1000], help="Liczba członków każdego serwera.")
+	memory_parser.add_argument("--wiadomosci", type=int, default=20, help="Liczba wiadomości wysłanych na każdym serwerze.")
+	arguments = parser.parse_args()
+
+	exit_code = 0
+	try:
+		if arguments.benchmark == "parsery":
+			benchmark_parser_backends(arguments.wiersze, arguments.powtorzenia)
+		elif arguments.benchmark == "pamiec":
+			benchmark_gateway_memory(arguments.serwery, arguments.czlonkowie, arguments.wiadomosci)
+		elif arguments.benchmark == "shardy":
+			if not asyncio.run(simulate_shards(arguments.serwery, arguments.shardy, arguments.procesy, arguments.wiersze)):
+				exit_code = 1
+		else:
+			results = benchmark_stages(arguments.wiersze, arguments.powtorzenia)
+			if arguments.zapisz:
+				with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+					json.dump(results, file, ensure_ascii=False, indent=4)
+				print(f"\nZapisano wyniki bazowe do {BASELINE_PATH}.")
+			elif arguments.porownaj and not compare_with_baseline(results, arguments.tolerancja):
+				exit_code = 1
+	finally:
+		os.chdir(REPOSITORY_DIRECTORY)
+		shutil.rmtree(WORKING_DIRECTORY, ignore_errors=True)
+	sys.exit(exit_code)
@@ -1,25 +1,95 @@
 # Standardowe biblioteki Pythona
+import argparse
+import atexit
+import gzip
 import json
 import os
+import queue
+import shutil
 import logging
 import logging.handlers
+import multiprocessing
 import asyncio
-from datetime import datetime
-import random
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import hashlib
+import random
+import re
+import glob
+import sqlite3
+import threading
+import time
+import zlib
+from typing import NamedTuple
 
 # Zewnętrzne biblioteki
 import discord
 from discord.ext import commands
 from discord import app_commands
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from aiohttp import web
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
 import pytz
 
+# Czas uruchomienia procesu, od którego mierzony jest czas do pierwszego sprawdzenia aktualizacji
+process_start_time = time.perf_counter()
+
 # Stałe przeznaczone do konfiguracji
 BOT_VERSION = "1.3.7-stable"
 TIMEZONE = pytz.timezone("Europe/Warsaw")	# Strefa czasowa dla logów.
-CHECK_INTERVAL = 300						# Czas (w sekundach) jaki bot wyczekuje, aby ponownie sprawdzić aktualizacje.
+LOG_LEVELS = {
+	"discord": "DEBUG",
+	"discord.client": "DEBUG",
+	"discord.gateway": "DEBUG",
+	"discord.http": "DEBUG",
+	"discord.commands": "DEBUG"
+	}										# Poziom logowania dla poszczególnych loggerów ("DEBUG", "INFO", "WARNING", "ERROR"). Podniesienie poziomu loggerów discord.gateway i discord.http znacząco zmniejsza ilość zapisywanych logów.
+LOG_CONSOLE_LEVEL = "INFO"					# Poziom logów wyświetlanych w konsoli.
+LOG_MAX_BYTES = 5 * 1024 * 1024				# Maksymalny rozmiar (w bajtach) pliku z logami, po którego przekroczeniu plik jest archiwizowany.
+LOG_BACKUP_COUNT = 7						# Liczba przechowywanych, skompresowanych archiwów każdego pliku z logami. Pliki z logami są archiwizowane również na początku każdego dnia.
+CHECK_INTERVAL = 1800						# Czas (w sekundach) jaki bot wyczekuje, aby ponownie sprawdzić aktualizacje poza przedziałami z POLLING_WINDOWS (np. w nocy).
+POLLING_WINDOWS = [
+	((0, 1, 2, 3, 4), 6, 9, 120),
+	((0, 1, 2, 3, 4), 9, 15, 600),
+	((0, 1, 2, 3, 4), 15, 22, 900),
+	((6,), 16, 22, 900)
+	]										# Przedziały czasu w strefie TIMEZONE w formacie (dni tygodnia, gdzie 0 to poniedziałek, godzina rozpoczęcia, godzina zakończenia, czas w sekundach między sprawdzeniami). Obowiązuje pierwszy pasujący przedział.
+CHANGE_CHECK_INTERVAL = 120					# Czas (w sekundach) między sprawdzeniami przez CHANGE_CHECK_DURATION sekund od wykrycia zmiany, kiedy strona jest często poprawiana.
+CHANGE_CHECK_DURATION = 1200				# Czas (w sekundach), przez jaki po wykryciu zmiany obowiązuje CHANGE_CHECK_INTERVAL.
+ERROR_BACKOFF_MAX = 3600					# Maksymalny czas (w sekundach) oczekiwania po kolejnych błędach pobierania strony. Czas ten rośnie wykładniczo od 60 sekund.
+POLLING_JITTER = 0.1						# Losowe odchylenie czasu oczekiwania (0.1 oznacza ±10%), aby zapytania nie trafiały do strony w równych odstępach.
+VOLATILE_CONTENT_PATTERNS = [
+	r"wygenerowano\s+[\d.\-/]+\s+o\s+[\d:]+"
+	]										# Wyrażenia regularne opisujące fragmenty strony zmieniające się przy każdym wygenerowaniu (np. data wygenerowania umieszczana przez Optivum). Są one pomijane przy sprawdzaniu, czy strona się zmieniła.
+FETCH_TIMEOUT = 10							# Maksymalny czas (w sekundach) oczekiwania na odpowiedź strony z zastępstwami.
+CONFIG_SAVE_DELAY = 2						# Czas (w sekundach), po jakim zapisywane są zmiany konfiguracji. Wszystkie zmiany dokonane w tym czasie są zapisywane jednocześnie.
+STATE_DATABASE = "state.db"					# Plik bazy danych SQLite, w którym bot przechowuje stan wysłanych aktualizacji dla każdego serwera.
+ARCHIVE_DATABASE = "archive.db"				# Plik bazy danych SQLite, w którym archiwizowane są kolejne wersje stron z zastępstwami. Wartość None wyłącza archiwum.
+ARCHIVE_RETENTION_DAYS = 180				# Liczba dni, przez jakie przechowywane są wersje stron w archiwum.
+ARCHIVE_MAX_BYTES = 100 * 1024 * 1024		# Maksymalny rozmiar (w bajtach) skompresowanych stron w archiwum. Po jego przekroczeniu usuwane są najstarsze wersje.
+DISPATCH_CONCURRENCY = 10					# Maksymalna liczba serwerów, na które jednocześnie wysyłane są aktualizacje.
+METRICS_HOST = "127.0.0.1"					# Adres, na którym udostępniane są metryki bota w formacie Prometheusa.
+METRICS_PORT = None							# Port, na którym udostępniane są metryki bota pod ścieżką /metrics (np. 9108). Wartość None wyłącza udostępnianie metryk.
+PARSER_BACKEND = "html.parser"				# Sposób przetwarzania strony: "html.parser", "lxml", "html.parser+strainer" lub "lxml+strainer". Warianty z "lxml" wymagają biblioteki lxml, a warianty "+strainer" budują drzewo wyłącznie z wierszy tabeli. Najszybszy wariant można wybrać za pomocą skryptu benchmark.py.
+PARSER_EXECUTOR = "thread"					# Rodzaj puli, w której przetwarzana jest strona: "thread" (wątki) lub "process" (procesy, zalecane przy bardzo dużych stronach).
+PARSER_WORKERS = 1							# Liczba wątków lub procesów przetwarzających stronę.
+PARSER_QUEUE_SIZE = 4						# Maksymalna liczba stron oczekujących na przetworzenie. Nadmiarowe strony są pomijane, aby cykle nie nakładały się na siebie. Wartość nie powinna być mniejsza niż SOURCE_CONCURRENCY.
+SOURCE_CONCURRENCY = 4						# Maksymalna liczba szkół, których strony są jednocześnie pobierane i przetwarzane.
+RUN_MODE = "bot"							# Tryb pracy procesu: "bot" (pobiera zastępstwa i samodzielnie wysyła je na serwery), "poller" (wyłącznie pobiera zastępstwa i przekazuje je procesom w trybie "shard", nie łącząc się z Discordem) lub "shard" (wysyła zastępstwa otrzymane od procesu w trybie "poller" na serwery swoich shardów). Tryb można zmienić opcją --tryb.
+SHARD_COUNT = None							# Całkowita liczba shardów bota we wszystkich procesach. Wartość None wyłącza shardy.
+SHARD_IDS = None							# Shardy obsługiwane przez ten proces (np. [0, 1]). Wartość None oznacza wszystkie shardy. Shardy można zmienić opcją --shardy.
+PUBLISHER_HOST = "127.0.0.1"				# Adres, na którym proces w trybie "poller" przekazuje zastępstwa procesom w trybie "shard".
+PUBLISHER_PORT = 8765						# Port, na którym proces w trybie "poller" przekazuje zastępstwa procesom w trybie "shard".
+LEAN_GATEWAY = False						# Tryb oszczędzający pamięć: bot nie korzysta z uprzywilejowanej intencji członków serwera, nie pobiera list członków i przechowuje ograniczoną liczbę wiadomości. Instrukcję po dodaniu bota na serwer otrzymuje wtedy wyłącznie właściciel serwera.
+MESSAGE_CACHE_SIZE = 100					# Maksymalna liczba wiadomości przechowywanych w pamięci w trybie LEAN_GATEWAY. Bot nie korzysta z tych wiadomości, więc wartość 0 całkowicie wyłącza ich przechowywanie.
+PUBLISHER_TIMEOUT = 600						# Maksymalny czas (w sekundach) oczekiwania na wysłanie zastępstw przez procesy w trybie "shard".
+WEBHOOK_DELIVERY = False					# Wysyłanie zastępstw przez webhooki tworzone przez bota na wybranych kanałach zamiast przez konto bota. Każdy webhook ma własne limity zapytań, niezależne od globalnego limitu bota, dzięki czemu aktualizacje mogą być wysyłane na wiele serwerów jednocześnie. Wymaga uprawnienia do zarządzania webhookami.
+WEBHOOK_CONCURRENCY = 50					# Maksymalna liczba serwerów, na które jednocześnie wysyłane są aktualizacje w trybie WEBHOOK_DELIVERY, a zarazem liczba połączeń we wspólnej puli webhooków.
+RENDER_CACHE_SIZE = 64						# Maksymalna liczba przefiltrowanych i przygotowanych do wysłania wersji zastępstw przechowywanych w pamięci. Serwery z takim samym filtrem klas korzystają z jednej wersji, więc wartość nie powinna być mniejsza niż liczba różnych filtrów wszystkich szkół.
+DM_CONCURRENCY = 4							# Maksymalna liczba subskrybentów, do których jednocześnie wysyłane są wiadomości prywatne.
+DM_RATE_LIMIT = 20							# Maksymalna liczba wiadomości prywatnych wysyłanych na sekundę. Globalny limit Discorda wynosi 50 zapytań na sekundę, a część z nich potrzebna jest do wysyłania zastępstw na serwery.
 URL = "https://zastepstwa.zse.bydgoszcz.pl/"# URL do pobierania zastępstw.
 ENCODING = "iso-8859-2"						# Kodowanie strony, z której pobierane są informacje. Jeżeli kodowanie nie będzie zgodne z tym na stronie, to bot będzie niepoprawnie wysyłał zastępstwa!
 TEACHERS_CELL_COLOR = "#69AADE"				# W przypadku strony z zastępstwami mojej szkoły, nauczyciel, za którego są zastępstwa, znajduje się w komórce z kolorem #69AADE, więc bot wczytuje jej zawartość w tytuł embeda, który wysyła podczas aktualizacji. Domyślnie ustawiony kolor przez VULCAN to #FFDFBF, ale zalecam sprawdzenie indywidualne.
@@ -35,43 +105,324 @@ classes_by_grade = {
 	"4": ["4 A", "4 B", "4 D", "4 E", "4 F", "4 H", "4 I"],
 	"5": ["5 A", "5 B", "5 D", "5 E", "5 F", "5 H", "5 I"]
 	}	# Tutaj znajdują się klasy, które filtruje bot. Klasy powyżej wprowadzone można zmienić pod własne zapotrzebowania.
+SOURCES = {
+	"zse": {
+		"name": "Zespół Szkół Elektronicznych w Bydgoszczy",
+		"url": URL,
+		"encoding": ENCODING,
+		"teachers_cell_color": TEACHERS_CELL_COLOR,
+		"classes_by_grade": classes_by_grade
+		}
+	}	# Szkoły, których zastępstwa obsługuje bot. Każda szkoła posiada własny URL, kodowanie, kolor komórki z nauczycielem oraz klasy. Szkołę serwera ustawia się podczas dodawania go komendą /zarządzaj.
+DEFAULT_SOURCE = "zse"						# Szkoła przypisywana serwerom, dla których nie wybrano szkoły.
 
 # Konfiguracja logów
 class TimezoneFormatter(logging.Formatter):
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.last_second = None
+		self.last_time = None
+
 	def formatTime(self, record, datefmt=None):
-		return datetime.now(TIMEZONE).strftime("%d-%m-%Y %H:%M:%S")
+		# Czas jest brany z rekordu, a sformatowany napis jest ponownie używany w obrębie tej samej sekundy
+		second = int(record.created)
+		if second != self.last_second:
+			self.last_time = datetime.fromtimestamp(second, TIMEZONE).strftime("%d-%m-%Y %H:%M:%S")
+			self.last_second = second
+		return self.last_time
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+	# Plik jest archiwizowany po przekroczeniu rozmiaru oraz na początku każdego dnia, a archiwa są kompresowane
+	def __init__(self, filename, **kwargs):
+		super().__init__(filename, **kwargs)
+		self.namer = lambda name: f"{name}.gz"
+		self.rotator = self.compress
+		self.current_date = self.get_date(os.path.getmtime(self.baseFilename)) if os.path.exists(self.baseFilename) else self.get_date(time.time())
+
+	@staticmethod
+	def get_date(timestamp):
+		return datetime.fromtimestamp(timestamp, TIMEZONE).date()
+
+	@staticmethod
+	def compress(source, destination):
+		with open(source, "rb") as source_file, gzip.open(destination, "wb") as destination_file:
+			shutil.copyfileobj(source_file, destination_file)
+		os.remove(source)
+
+	def shouldRollover(self, record):
+		date = self.get_date(record.created)
+		if date != self.current_date:
+			self.current_date = date
+			return os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0
+		return super().shouldRollover(record)
 
 def setup_logging():
+	global log_listener
 	console_logger = logging.getLogger("discord")
-	console_logger.setLevel(logging.DEBUG)
 	commands_logger = logging.getLogger("discord.commands")
-	commands_logger.setLevel(logging.DEBUG)
-	
-	console_handler = logging.handlers.RotatingFileHandler(
+	for name, level in LOG_LEVELS.items():
+		logging.getLogger(name).setLevel(level)
+
+	# Procesy przetwarzające stronę importują ten plik ponownie, a ich logi zapisuje proces bota (init_parser_process)
+	if multiprocessing.current_process().name != "MainProcess":
+		return console_logger, commands_logger
+
+	console_handler = CompressedRotatingFileHandler(
 	filename="console.log",
+	maxBytes=LOG_MAX_BYTES,
+	backupCount=LOG_BACKUP_COUNT,
 	encoding="utf-8")
-	console_handler.setLevel(logging.DEBUG)
 
-	commands_handler = logging.handlers.RotatingFileHandler(
+	commands_handler = CompressedRotatingFileHandler(
 	filename="commands.log",
+	maxBytes=LOG_MAX_BYTES,
+	backupCount=LOG_BACKUP_COUNT,
 	encoding="utf-8")
-	commands_handler.setLevel(logging.DEBUG)
-	
+	commands_handler.addFilter(logging.Filter("discord.commands"))
+
+	stream_handler = logging.StreamHandler()
+	stream_handler.setLevel(LOG_CONSOLE_LEVEL)
+
 	formatter = TimezoneFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 	console_handler.setFormatter(formatter)
 	commands_handler.setFormatter(formatter)
-	
-	console_logger.addHandler(console_handler)
-	commands_logger.addHandler(commands_handler)
+	stream_handler.setFormatter(formatter)
+
+	# Zapis logów odbywa się w osobnym wątku, więc nie wstrzymuje pętli zdarzeń bota
+	log_queue = queue.SimpleQueue()
+	console_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+	log_listener = logging.handlers.QueueListener(log_queue, console_handler, commands_handler, stream_handler, respect_handler_level=True)
+	log_listener.start()
+	atexit.register(log_listener.stop)
 
 	return console_logger, commands_logger
 
+log_listener = None
 console_logger, commands_logger = setup_logging()
 
+def start_process_log_listener(context):
+	# Logi procesów przetwarzających stronę trafiają do kolejki międzyprocesowej, z której zapisuje je osobny wątek procesu bota
+	log_queue = context.Queue()
+	listener = logging.handlers.QueueListener(log_queue, *log_listener.handlers, respect_handler_level=True)
+	listener.start()
+	atexit.register(listener.stop)
+	return log_queue
+
+def init_parser_process(log_queue):
+	logger = logging.getLogger("discord")
+	for handler in list(logger.handlers):
+		logger.removeHandler(handler)
+	logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
 # Pobieranie aktualnego czasu
 def get_current_time():
 	return datetime.now(TIMEZONE).strftime("%d-%m-%Y %H:%M:%S")
 
+# Metryki
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_DESCRIPTIONS = {
+	"fetches_total": ("counter", "Liczba pobrań strony z zastępstwami według statusu odpowiedzi."),
+	"fetch_duration_seconds": ("histogram", "Czas pobierania strony z zastępstwami."),
+	"parse_duration_seconds": ("histogram", "Czas przetwarzania strony z zastępstwami."),
+	"entries_extracted": ("gauge", "Liczba wpisów wyodrębnionych z ostatnio przetworzonej strony."),
+	"diff_duration_seconds": ("histogram", "Czas filtrowania zastępstw i wykrywania zmian dla jednego serwera."),
+	"guilds_total": ("counter", "Liczba obsłużonych serwerów według wyniku."),
+	"messages_total": ("counter", "Liczba operacji na wiadomościach Discorda według rodzaju."),
+	"discord_rate_limits_total": ("counter", "Liczba odpowiedzi 429 otrzymanych od Discorda."),
+	"event_loop_lag_seconds": ("histogram", "Opóźnienie pętli zdarzeń."),
+	"dispatch_duration_seconds": ("histogram", "Czas od rozpoczęcia wysyłania aktualizacji do obsłużenia ostatniego serwera."),
+	"cycles_total": ("counter", "Liczba cykli sprawdzania aktualizacji według wyniku."),
+	"cycle_duration_seconds": ("histogram", "Czas trwania cyklu sprawdzania aktualizacji."),
+	"startup_to_first_poll_seconds": ("gauge", "Czas od uruchomienia procesu do rozpoczęcia pierwszego sprawdzania aktualizacji."),
+	"service_restarts_total": ("counter", "Liczba ponownych uruchomień usług działających w tle po awarii."),
+	"direct_messages_total": ("counter", "Liczba wiadomości prywatnych do subskrybentów według wyniku."),
+	"render_cache_total": ("counter", "Liczba odczytów przygotowanych wersji zastępstw z pamięci podręcznej według wyniku.")
+}
+
+class Metrics:
+	def __init__(self):
+		self.counters = {}
+		self.gauges = {}
+		self.histograms = {}
+
+	def increment(self, name, value=1, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		self.counters[key] = self.counters.get(key, 0) + value
+
+	def set_gauge(self, name, value, **labels):
+		self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+	def observe(self, name, value, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		histogram = self.histograms.get(key)
+		if histogram is None:
+			histogram = self.histograms[key] = {"buckets": [0] * len(HISTOGRAM_BUCKETS), "sum": 0.0, "count": 0, "last": 0.0, "max": 0.0}
+		for index, bound in enumerate(HISTOGRAM_BUCKETS):
+			if value <= bound:
+				histogram["buckets"][index] += 1
+		histogram["sum"] += value
+		histogram["count"] += 1
+		histogram["last"] = value
+		histogram["max"] = max(histogram["max"], value)
+
+	def total(self, name, **labels):
+		wanted = set(labels.items())
+		return sum(value for (metric, metric_labels), value in self.counters.items() if metric == name and wanted <= set(metric_labels))
+
+	def gauge_total(self, name):
+		return sum(value for (metric, _), value in self.gauges.items() if metric == name)
+
+	def histogram(self, name):
+		# Połączenie histogramów o wszystkich etykietach, używane w podsumowaniu
+		merged = {"sum": 0.0, "count": 0, "last": 0.0, "max": 0.0}
+		for (metric, _), histogram in self.histograms.items():
+			if metric == name:
+				merged["sum"] += histogram["sum"]
+				merged["count"] += histogram["count"]
+				merged["last"] = histogram["last"]
+				merged["max"] = max(merged["max"], histogram["max"])
+		return merged
+
+	@staticmethod
+	def format_labels(labels, extra=()):
+		pairs = [*labels, *extra]
+		if not pairs:
+			return ""
+		escaped = []
+		for key, value in pairs:
+			value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+			escaped.append(f'{key}="{value}"')
+		return "{" + ",".join(escaped) + "}"
+
+	def render(self):
+		lines = []
+		for name, (kind, description) in METRIC_DESCRIPTIONS.items():
+			metric_name = f"zastepstwa_{name}"
+			lines.append(f"# HELP {metric_name} {description}")
+			lines.append(f"# TYPE {metric_name} {kind}")
+			if kind == "histogram":
+				for (metric, labels), histogram in self.histograms.items():
+					if metric != name:
+						continue
+					for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"]):
+						lines.append(f"{metric_name}_bucket{self.format_labels(labels, (('le', bound),))} {count}")
+					lines.append(f"{metric_name}_bucket{self.format_labels(labels, (('le', '+Inf'),))} {histogram['count']}")
+					lines.append(f"{metric_name}_sum{self.format_labels(labels)} {histogram['sum']}")
+					lines.append(f"{metric_name}_count{self.format_labels(labels)} {histogram['count']}")
+			else:
+				values = self.counters if kind == "counter" else self.gauges
+				for (metric, labels), value in values.items():
+					if metric == name:
+						lines.append(f"{metric_name}{self.format_labels(labels)} {value}")
+		return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class RateLimitCounter(logging.Handler):
+	# discord.py obsługuje odpowiedzi 429 samodzielnie i jedynie informuje o nich w logach
+	def emit(self, record):
+		if isinstance(record.msg, str) and "rate limited" in record.msg:
+			metrics.increment("discord_rate_limits_total")
+
+console_logger.addHandler(RateLimitCounter(logging.WARNING))
+
+async def monitor_event_loop_lag(interval=1.0):
+	loop = asyncio.get_running_loop()
+	while True:
+		start = loop.time()
+		await asyncio.sleep(interval)
+		metrics.observe("event_loop_lag_seconds", max(0.0, loop.time() - start - interval))
+
+async def start_metrics_server():
+	async def handle_metrics(request):
+		return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8", headers={"X-Content-Type-Options": "nosniff"})
+
+	application = web.Application()
+	application.router.add_get("/metrics", handle_metrics)
+	runner = web.AppRunner(application, access_log=None)
+	await runner.setup()
+	await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+	console_logger.info(f"Metryki są udostępniane pod adresem http://{METRICS_HOST}:{METRICS_PORT}/metrics.")
+	return runner
+
+# Usługi działające w tle
+class BackgroundService:
+	def __init__(self, name, function):
+		self.name = name
+		self.function = function
+		self.task = None
+
+	def start(self):
+		# Usługa działa zawsze w jednym egzemplarzu, niezależnie od liczby wywołań
+		if self.task is None or self.task.done():
+			self.task = asyncio.create_task(self.supervise(), name=self.name)
+
+	async def supervise(self):
+		delay = 5
+		while True:
+			started = time.monotonic()
+			try:
+				await self.function()
+				return
+			except Exception as e:
+				console_logger.exception(f"Usługa {self.name} uległa awarii: {e}")
+				metrics.increment("service_restarts_total", service=self.name)
+			# Po dłuższym poprawnym działaniu usługa jest uruchamiana ponownie bez wydłużonego oczekiwania
+			if time.monotonic() - started > 300:
+				delay = 5
+			console_logger.info(f"Ponowne uruchomienie usługi {self.name} za {delay} s.")
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, 300)
+
+	def stop(self):
+		if self.task is not None:
+			self.task.cancel()
+			self.task = None
+
+# Dopasowywanie klas
+def compile_class_matcher(classes_by_grade):
+	# Dłuższe nazwy są sprawdzane jako pierwsze, a granice słów zapobiegają dopasowaniu "1 A" wewnątrz "1 AB"
+	classes = sorted({cls for grade_classes in classes_by_grade.values() for cls in grade_classes}, key=len, reverse=True)
+	return re.compile(r"(?<!\w)(" + "|".join(re.escape(cls) for cls in classes) + r")(?!\w)")
+
+class_matcher = compile_class_matcher(classes_by_grade)
+
+def find_classes(text, matcher=None):
+	return tuple(dict.fromkeys((matcher or class_matcher).findall(text)))
+
+# Limity wiadomości Discorda
+EMBED_TITLE_LIMIT = 256
+EMBED_DESCRIPTION_LIMIT = 4096
+MESSAGE_EMBEDS_LIMIT = 10
+MESSAGE_CHARACTERS_LIMIT = 6000
+SELECT_OPTIONS_LIMIT = 25
+
+# Zastępstwa w postaci rekordów
+class Substitution(NamedTuple):
+	teacher: str | None
+	lesson: str
+	description: str
+	substitute: str
+	notes: str
+	classes: tuple
+
+	def fingerprint(self):
+		return "\x1f".join((self.lesson, self.description, self.substitute, self.notes))
+
+SUBSTITUTION_LABELS = ("Lekcja", "Opis", "Zastępca", "Uwagi")
+
+def render_substitution(substitution):
+	entry_lines = []
+	for label, value in zip(SUBSTITUTION_LABELS, (substitution.lesson, substitution.description, substitution.substitute, substitution.notes)):
+		if value:
+			entry_lines.append(f"**{label}:** {value}")
+		elif entry_lines:
+			entry_lines.append(f"**{label}:** Brak")
+	return "\n".join(entry_lines)
+
+def render_substitutions(substitutions):
+	return "\n\n".join(render_substitution(substitution) for substitution in substitutions)
+
 # Kalkulacja hashu
 def calculate_hash_from_data(data):
 	if isinstance(data, str):
@@ -80,93 +431,409 @@ def calculate_hash_from_data(data):
 	elif isinstance(data, list):
 		hash_input = ""
 		for title, entry_list in data:
-			hash_input += title.strip() + "".join(entry.strip() for entry in entry_list)
+			hash_input += title.strip() + "".join(entry.fingerprint() for entry in entry_list)
 
 	elif isinstance(data, dict):
 		hash_input = ""
 		for key, value in data.items():
-			hash_input += key.strip() + "".join(entry.strip() for entry in value)
+			hash_input += (key or "").strip() + "".join(entry.fingerprint() for entry in value)
 
 	else:
 		hash_input = str(data)
 
 	return hashlib.sha256(hash_input.encode("utf-8")).hexdigest()
 
+# Wykrywanie zmian na poziomie sekcji, nauczycieli i pojedynczych wpisów
+def calculate_fingerprint(text):
+	return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def build_blocks(current_entries, no_class_entries_by_teacher):
+	# Blok to wszystkie wpisy jednego nauczyciela w danej sekcji, ogłaszane w jednej wiadomości
+	blocks = {}
+	for title, entries in no_class_entries_by_teacher.items():
+		blocks.setdefault(f"no_class:{title or ''}", ("no_class", title, []))[2].extend(entries)
+	for title, entries in current_entries:
+		blocks.setdefault(f"entries:{title}", ("entries", title, []))[2].extend(entries)
+	return blocks
+
+def calculate_block_fingerprints(entries):
+	entry_hashes = {}
+	occurrences = {}
+	for entry in entries:
+		occurrence = occurrences.get(entry.lesson, 0)
+		occurrences[entry.lesson] = occurrence + 1
+		entry_hashes[f"{entry.lesson}#{occurrence}"] = calculate_fingerprint(entry.fingerprint())
+	return {"hash": calculate_fingerprint("".join(entry_hashes.values())), "entries": entry_hashes}
+
+def build_state(additional_info, current_entries, no_class_entries_by_teacher, blocks):
+	return {
+		"additional_info_hash": calculate_hash_from_data(additional_info),
+		"entries_hash": calculate_hash_from_data(current_entries),
+		"no_class_entries_by_teacher_hash": calculate_hash_from_data(no_class_entries_by_teacher),
+		"teachers": {key: calculate_block_fingerprints(entries) for key, (_, _, entries) in blocks.items()}
+	}
+
+class SubstitutionsDiff(NamedTuple):
+	additional_info_changed: bool
+	changed_blocks: list
+	removed_blocks: list
+	added: int
+	modified: int
+	removed: int
+
+	def has_changes(self):
+		return self.additional_info_changed or bool(self.changed_blocks) or bool(self.removed_blocks)
+
+def diff_states(previous_state, current_state):
+	additional_info_changed = previous_state.get("additional_info_hash", "") != current_state["additional_info_hash"]
+	previous_teachers = previous_state.get("teachers")
+
+	# Niezmienione sekcje nie wymagają porównywania nauczycieli ani wpisów
+	if previous_teachers is not None and all(previous_state.get(key, "") == current_state[key] for key in ("entries_hash", "no_class_entries_by_teacher_hash")):
+		return SubstitutionsDiff(additional_info_changed, [], [], 0, 0, 0)
+
+	previous_teachers = previous_teachers or {}
+	changed_blocks = []
+	added = modified = removed = 0
+	for key, block in current_state["teachers"].items():
+		previous_block = previous_teachers.get(key)
+		if previous_block and previous_block["hash"] == block["hash"]:
+			continue
+
+		previous_entries = previous_block["entries"] if previous_block else {}
+		for entry_key, entry_hash in block["entries"].items():
+			if entry_key not in previous_entries:
+				added += 1
+			elif previous_entries[entry_key] != entry_hash:
+				modified += 1
+		removed += sum(1 for entry_key in previous_entries if entry_key not in block["entries"])
+		changed_blocks.append(key)
+
+	removed_blocks = [key for key in previous_teachers if key not in current_state["teachers"]]
+	removed += sum(len(previous_teachers[key]["entries"]) for key in removed_blocks)
+	return SubstitutionsDiff(additional_info_changed, changed_blocks, removed_blocks, added, modified, removed)
+
 # Obsługa konfiguracji
-def load_config():
-	if not os.path.exists("config.json"):
-		console_logger.error("Brak pliku konfiguracyjnego.")
-		exit(1)
-	try:
-		with open("config.json", "r") as file:
+class ConfigService:
+	def __init__(self, path):
+		self.path = path
+		self.apply(self.load())
+		self.version = 0
+		self.dirty = False
+		self.save_handle = None
+		self.save_task = None
+		self.write_lock = threading.Lock()
+		self.modified_time = self.get_modified_time()
+
+	def apply(self, data):
+		self.data = data
+		self.guilds = self.data.setdefault("guilds", {})
+		self.data.setdefault("allowed_guilds", [])
+		self.data.setdefault("allowed_users", [])
+
+		# Indeksy pozwalające sprawdzać uprawnienia bez przeszukiwania list
+		self.allowed_guilds = set(map(str, self.data["allowed_guilds"]))
+		self.allowed_users = set(map(str, self.data["allowed_users"]))
+
+	def read(self):
+		with open(self.path, "r") as file:
 			config = json.load(file)
 			for guild_id in config.get("allowed_guilds", []):
 				config.setdefault("guilds", {}).setdefault(str(guild_id), {"channel_id": None, "selected_classes": []})
 			return config
-	except json.JSONDecodeError as e:
-		console_logger.error(f"Błąd podczas wczytywania pliku konfiguracyjnego: {e}")
-		exit(1)
 
-# Zmienne globalne
-config = load_config()
-guild_config = config.get("guilds", {})
+	def load(self):
+		if not os.path.exists(self.path):
+			console_logger.error("Brak pliku konfiguracyjnego.")
+			exit(1)
+		try:
+			return self.read()
+		except json.JSONDecodeError as e:
+			console_logger.error(f"Błąd podczas wczytywania pliku konfiguracyjnego: {e}")
+			exit(1)
 
-# Zapisanie konfiguracji
-def save_config(config):
-	try:
-		with open("config.json", "w") as f:
-			json.dump(config, f, indent=4)
-	except IOError as e:
-		console_logger.error(f"Błąd podczas zapisywania pliku konfiguracyjnego: {e}")
+	def get_modified_time(self):
+		try:
+			return os.stat(self.path).st_mtime_ns
+		except OSError:
+			return None
+
+	def reload_if_changed(self):
+		# W trybie z shardami plik konfiguracyjny zmieniają również inne procesy bota
+		if self.dirty or self.save_handle is not None:
+			return
+		modified_time = self.get_modified_time()
+		if modified_time is None or modified_time == self.modified_time:
+			return
+		try:
+			data = self.read()
+		except (OSError, json.JSONDecodeError) as e:
+			console_logger.error(f"Błąd podczas ponownego wczytywania pliku konfiguracyjnego: {e}")
+			return
+		self.modified_time = modified_time
+		self.apply(data)
+		self.version += 1
+		console_logger.info("Wczytano zmienioną konfigurację z pliku.")
+
+	def get(self, key, default=None):
+		return self.data.get(key, default)
+
+	def is_guild_allowed(self, guild_id):
+		return str(guild_id) in self.allowed_guilds
+
+	def is_user_allowed(self, user_id):
+		return str(user_id) in self.allowed_users
+
+	def get_allowed_guilds(self):
+		return self.data["allowed_guilds"]
+
+	def get_guild(self, guild_id):
+		return self.guilds.get(str(guild_id), {})
+
+	def add_guild(self, guild_id, source_id=DEFAULT_SOURCE):
+		self.reload_if_changed()
+		guild_id = str(guild_id)
+		self.data["allowed_guilds"].append(guild_id)
+		self.allowed_guilds.add(guild_id)
+		self.guilds[guild_id] = {"channel_id": None, "selected_classes": [], "source": source_id}
+		self.schedule_save()
+
+	def remove_guild(self, guild_id):
+		self.reload_if_changed()
+		guild_id = str(guild_id)
+		self.data["allowed_guilds"].remove(guild_id)
+		self.allowed_guilds.discard(guild_id)
+		self.guilds.pop(guild_id, None)
+		self.schedule_save()
+
+	def set_channel(self, guild_id, channel_id):
+		self.reload_if_changed()
+		self.guilds.setdefault(str(guild_id), {})["channel_id"] = str(channel_id)
+		self.schedule_save()
+
+	def set_webhook(self, guild_id, channel_id, webhook_url):
+		self.reload_if_changed()
+		self.guilds.setdefault(str(guild_id), {})["webhook"] = {"channel_id": str(channel_id), "url": webhook_url}
+		self.schedule_save()
+
+	def clear_webhook(self, guild_id):
+		self.reload_if_changed()
+		if self.guilds.get(str(guild_id), {}).pop("webhook", None) is not None:
+			self.schedule_save()
+
+	def set_source(self, guild_id, source_id):
+		self.reload_if_changed()
+		guild = self.guilds.setdefault(str(guild_id), {})
+		if guild.get("source", DEFAULT_SOURCE) != source_id:
+			# Klasy różnią się między szkołami, więc wybrane klasy poprzedniej szkoły są usuwane
+			guild.pop("selected_classes", None)
+		guild["source"] = source_id
+		self.schedule_save()
+
+	def set_selected_classes(self, guild_id, selected_classes):
+		self.reload_if_changed()
+		self.guilds.setdefault(str(guild_id), {})["selected_classes"] = list(selected_classes)
+		self.schedule_save()
+
+	def clear_selected_classes(self, guild_id):
+		self.reload_if_changed()
+		if str(guild_id) in self.guilds:
+			self.guilds[str(guild_id)].pop("selected_classes", None)
+			self.schedule_save()
+
+	def schedule_save(self):
+		# Zapis jest odkładany, aby seria zmian kończyła się jednym zapisem pliku
+		self.version += 1
+		self.dirty = True
+		self.schedule_write()
+
+	def schedule_write(self):
+		if self.save_handle is not None:
+			self.save_handle.cancel()
+		self.save_handle = asyncio.get_running_loop().call_later(CONFIG_SAVE_DELAY, self.start_save)
+
+	def start_save(self):
+		# Referencja do zadania chroni je przed usunięciem przez garbage collector w trakcie zapisu
+		self.save_task = asyncio.create_task(self.save())
+
+	async def save(self):
+		self.save_handle = None
+		if not self.dirty:
+			return
+		self.dirty = False
+		content = json.dumps(self.data, indent=4)
+		if not await asyncio.to_thread(self.write, content):
+			# Niezapisane zmiany są ponawiane, aby błąd zapisu nie powodował ich utraty
+			self.dirty = True
+			if self.save_handle is None:
+				self.schedule_write()
+
+	def write(self, content):
+		# Plik jest podmieniany atomowo, dzięki czemu przerwany zapis nie uszkodzi konfiguracji
+		temporary_path = f"{self.path}.tmp"
+		try:
+			with self.write_lock:
+				with open(temporary_path, "w") as file:
+					file.write(content)
+					file.flush()
+					os.fsync(file.fileno())
+				os.replace(temporary_path, self.path)
+				self.modified_time = self.get_modified_time()
+			return True
+		except OSError as e:
+			console_logger.error(f"Błąd podczas zapisywania pliku konfiguracyjnego: {e}")
+			return False
+
+	async def flush(self):
+		if self.save_handle is not None:
+			self.save_handle.cancel()
+		if self.save_task is not None:
+			await self.save_task
+			self.save_task = None
+		await self.save()
+
+config_service = ConfigService("config.json")
 
 # Pobieranie i przetwarzanie danych z witryny
-def fetch_website_content(url):
-	console_logger.info(f"Pobieranie URL: {url}")
-	try:
-		response = requests.get(url, timeout=10)
-		response.raise_for_status()
-		response.encoding = ENCODING 
-		return BeautifulSoup(response.text, "html.parser")
-	except requests.Timeout as e:
-		console_logger.warning(f"Przekroczono czas oczekiwania na połączenie. Więcej informacji: {e}")
-	except requests.RequestException as e:
-		console_logger.error(f"Nie udało się pobrać URL: {e}")
-	return None
-
-def extract_data_from_html(soup, filter_classes, classes_by_grade):
+class FetchResult(NamedTuple):
+	status: int | None
+	text: str | None
+	elapsed: float
+	not_modified: bool = False
+
+class HttpSession:
+	def __init__(self, limit):
+		self.limit = limit
+		self.session = None
+
+	def get(self):
+		# Jedna sesja ze współdzieloną pulą połączeń na cały czas działania bota, wspólna dla stron wszystkich szkół
+		if self.session is None or self.session.closed:
+			self.session = aiohttp.ClientSession(
+				connector=aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=300),
+				timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+			)
+		return self.session
+
+	async def close(self):
+		if self.session is not None and not self.session.closed:
+			await self.session.close()
+
+http_session = HttpSession(max(4, SOURCE_CONCURRENCY))
+
+class WebsiteFetcher:
+	def __init__(self, source_id, url, encoding):
+		self.source_id = source_id
+		self.url = url
+		self.encoding = encoding
+		self.etag = None
+		self.last_modified = None
+		self.last_text = None
+
+	async def fetch(self):
+		console_logger.info(f"Pobieranie URL: {self.url}")
+		headers = {}
+		if self.last_text is not None:
+			if self.etag:
+				headers["If-None-Match"] = self.etag
+			if self.last_modified:
+				headers["If-Modified-Since"] = self.last_modified
+
+		start = time.perf_counter()
+		try:
+			async with http_session.get().get(self.url, headers=headers) as response:
+				if response.status == 304:
+					elapsed = time.perf_counter() - start
+					self.record_metrics(response.status, elapsed)
+					console_logger.info(f"Strona nie uległa zmianie (status: 304, czas: {elapsed * 1000:.0f} ms).")
+					return FetchResult(response.status, self.last_text, elapsed, not_modified=True)
+
+				response.raise_for_status()
+				body = await response.read()
+				self.etag = response.headers.get("ETag")
+				self.last_modified = response.headers.get("Last-Modified")
+				self.last_text = body.decode(self.encoding, errors="replace")
+				elapsed = time.perf_counter() - start
+				self.record_metrics(response.status, elapsed)
+				console_logger.info(f"Pobrano URL (status: {response.status}, rozmiar: {len(body)} B, czas: {elapsed * 1000:.0f} ms).")
+				return FetchResult(response.status, self.last_text, elapsed)
+		except asyncio.TimeoutError as e:
+			console_logger.warning(f"Przekroczono czas oczekiwania na połączenie. Więcej informacji: {e}")
+			self.record_metrics("timeout", time.perf_counter() - start)
+			return FetchResult(None, None, time.perf_counter() - start)
+		except aiohttp.ClientResponseError as e:
+			console_logger.error(f"Nie udało się pobrać URL: {e}")
+			self.record_metrics(e.status, time.perf_counter() - start)
+			return FetchResult(e.status, None, time.perf_counter() - start)
+		except aiohttp.ClientError as e:
+			console_logger.error(f"Nie udało się pobrać URL: {e}")
+			self.record_metrics("error", time.perf_counter() - start)
+			return FetchResult(None, None, time.perf_counter() - start)
+
+	def record_metrics(self, status, elapsed):
+		metrics.increment("fetches_total", source=self.source_id, status=status)
+		metrics.observe("fetch_duration_seconds", elapsed, source=self.source_id)
+
+# Odcisk surowej treści strony
+volatile_content_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in VOLATILE_CONTENT_PATTERNS)) if VOLATILE_CONTENT_PATTERNS else None
+
+def calculate_snapshot_fingerprint(text):
+	if volatile_content_pattern is not None:
+		text = volatile_content_pattern.sub("", text)
+	return calculate_fingerprint(text)
+
+PARSER_BACKENDS = {
+	"html.parser": ("html.parser", False),
+	"lxml": ("lxml", False),
+	"html.parser+strainer": ("html.parser", True),
+	"lxml+strainer": ("lxml", True)
+}
+ROWS_STRAINER = SoupStrainer("tr")
+
+def resolve_parser_backend(backend):
+	if backend not in PARSER_BACKENDS:
+		console_logger.warning(f"Nieznany sposób przetwarzania strony: {backend}. Używanie html.parser.")
+		return "html.parser"
+	features, _ = PARSER_BACKENDS[backend]
+	if builder_registry.lookup(features) is None:
+		console_logger.warning(f"Biblioteka wymagana przez {backend} nie jest zainstalowana. Używanie html.parser.")
+		return "html.parser"
+	return backend
+
+def parse_website_content(text, backend=None):
+	features, rows_only = PARSER_BACKENDS[backend or parser_backend]
+	return BeautifulSoup(text, features, parse_only=ROWS_STRAINER if rows_only else None)
+
+class ParsedSubstitutions(NamedTuple):
+	additional_info: str
+	sections: list
+	class_index: dict
+
+EMPTY_SUBSTITUTIONS = ParsedSubstitutions("", [], {})
+
+def extract_data_from_html(soup, teachers_cell_color=TEACHERS_CELL_COLOR, matcher=None):
 	if soup is None:
 		console_logger.warning("Brak treści pobranej ze strony.")
-		return "", [], {}
+		return EMPTY_SUBSTITUTIONS
 
 	try:
-		entries = []
+		sections = []
+		class_index = {}
 		additional_info = ""
-		rows = soup.find_all("tr")
-
-		# Ekstrakcja dodatkowych informacji
-		additional_info_cell = next((cell for row in rows for cell in row.find_all("td") if cell.get("class") == ["st0"]), None)
-		if additional_info_cell:
-			link_tag = additional_info_cell.find("a")
-			if link_tag and link_tag.get("href"):
-				link_text = link_tag.get_text(strip=True)
-				link_url = link_tag["href"]
-				additional_info_text = additional_info_cell.get_text(separator="\n", strip=True).replace(link_text, "").strip()
-				additional_info = f"{additional_info_text}\n[{link_text}]({link_url})"
-			else:
-				additional_info = additional_info_cell.get_text(separator="\n", strip=True)
-
+		additional_info_cell = None
 		current_title = None
 		current_entries = []
-		no_class_entries_by_teacher = {}
 
-		for row in rows:
+		# Tabela jest przechodzona jednokrotnie, a komórka z dodatkowymi informacjami jest wyszukiwana po drodze
+		for row in soup.find_all("tr"):
 			cells = row.find_all("td")
+			if additional_info_cell is None:
+				additional_info_cell = next((cell for cell in cells if cell.get("class") == ["st0"]), None)
 
 			if len(cells) == 1:
 				cell = cells[0]
-				if cell.get("bgcolor") == TEACHERS_CELL_COLOR:
-					if current_title and current_entries:
-						entries.append((current_title, current_entries))
+				if cell.get("bgcolor") == teachers_cell_color:
+					sections.append((current_title, current_entries))
 					current_title = cell.get_text(separator="\n", strip=True)
 					current_entries = []
 					continue
@@ -175,78 +842,504 @@ def extract_data_from_html(soup, filter_classes, classes_by_grade):
 
 			# Wyodrębnianie danych zastępstw
 			if len(cells) == 4:
-				lekcja, opis, zastępca, uwagi = (cell.get_text(strip=True) for cell in cells)
-
-				entry_lines = []
-				if lekcja and lekcja != "lekcja":
-					entry_lines.append(f"**Lekcja:** {lekcja}")
-				elif len(entry_lines) > 0:
-					entry_lines.append("**Lekcja:** Brak")
-				if opis and opis != "opis":
-					entry_lines.append(f"**Opis:** {opis}")
-				elif len(entry_lines) > 0:
-					entry_lines.append("**Opis:** Brak")
-				if zastępca and zastępca != "zastępca":
-					entry_lines.append(f"**Zastępca:** {zastępca}")
-				elif len(entry_lines) > 0:
-					entry_lines.append("**Zastępca:** Brak")
-				if uwagi and uwagi != "uwagi":
-					entry_lines.append(f"**Uwagi:** {uwagi}")
-				elif len(entry_lines) > 0:
-					entry_lines.append("**Uwagi:** Brak")
-
-				entry_text = "\n".join(entry_lines).strip()
-				if entry_text:
-					if not filter_classes:
-						current_entries.append(entry_text)
-					else:
-						if not any(cls in entry_text for grade_classes in classes_by_grade.values() for cls in grade_classes):
-							if current_title not in no_class_entries_by_teacher:
-								no_class_entries_by_teacher[current_title] = []
-							no_class_entries_by_teacher[current_title].append(entry_text)
-						elif any(cls in entry_text for cls in filter_classes):
-							current_entries.append(entry_text)
-
-		if current_title and current_entries:
-			entries.append((current_title, current_entries))
-
-		console_logger.info(f"Wyodrębniono {len(entries)} wpis(ów) z przypisanymi klasami.")
-		console_logger.info(f"Wyodrębniono {len(no_class_entries_by_teacher)} wpis(ów) bez przypisanych klas.")
-		return additional_info, entries, no_class_entries_by_teacher
+				# Wartości równe nagłówkom kolumn są traktowane jak puste, dzięki czemu wiersz nagłówka jest pomijany
+				lekcja, opis, zastępca, uwagi = (
+					"" if value == header else value
+					for value, header in zip((cell.get_text(strip=True) for cell in cells), ("lekcja", "opis", "zastępca", "uwagi"))
+				)
+				if lekcja or opis or zastępca or uwagi:
+					# Indeks klasa -> pozycje wpisów; wpisy bez klasy trafiają pod klucz None
+					classes = find_classes(opis, matcher)
+					position = (len(sections), len(current_entries))
+					for cls in classes or (None,):
+						class_index.setdefault(cls, []).append(position)
+					current_entries.append(Substitution(current_title, lekcja, opis, zastępca, uwagi, classes))
+
+		sections.append((current_title, current_entries))
+
+		# Ekstrakcja dodatkowych informacji
+		if additional_info_cell:
+			link_tag = additional_info_cell.find("a")
+			if link_tag and link_tag.get("href"):
+				link_text = link_tag.get_text(strip=True)
+				link_url = link_tag["href"]
+				additional_info_text = additional_info_cell.get_text(separator="\n", strip=True).replace(link_text, "").strip()
+				additional_info = f"{additional_info_text}\n[{link_text}]({link_url})"
+			else:
+				additional_info = additional_info_cell.get_text(separator="\n", strip=True)
+
+		console_logger.info(f"Wyodrębniono {sum(len(entries) for _, entries in sections)} wpis(ów) ze strony.")
+		return ParsedSubstitutions(additional_info, sections, class_index)
 	except Exception as e:
+		# Błąd jest przekazywany dalej, ponieważ pusty wynik zostałby potraktowany jak strona bez zastępstw i usunąłby wysłane wiadomości
 		console_logger.error(f"Błąd podczas przetwarzania HTML: {e}")
-		return "", [], {}
+		raise
 
-# Obsługa plików danych
-def manage_data_file(guild_id, data=None):
-	file_path = f"previous_hash_{guild_id}.json"
-	try:
-		if data is not None:
-			with open(file_path, "w", encoding="utf-8") as file:
-				json.dump(data, file, ensure_ascii=False, indent=4)
-		else:
-			if os.path.exists(file_path):
+# Przetwarzanie strony poza pętlą zdarzeń
+def parse_substitutions(text, teachers_cell_color=TEACHERS_CELL_COLOR, matcher=None):
+	return extract_data_from_html(parse_website_content(text), teachers_cell_color, matcher)
+
+class ParsingService:
+	def __init__(self, executor_type, max_workers, queue_size):
+		self.executor_type = executor_type
+		self.max_workers = max_workers
+		self.queue_size = queue_size
+		self.executor = None
+		self.log_queue = None
+		self.queue = None
+		self.workers = []
+
+	def start(self):
+		if self.executor is None:
+			if self.executor_type == "process":
+				# Procesy są uruchamiane metodą spawn, ponieważ fork kopiowałby proces z działającymi już wątkami logów i pętlą zdarzeń
+				context = multiprocessing.get_context("spawn")
+				if self.log_queue is None:
+					self.log_queue = start_process_log_listener(context)
+				self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context, initializer=init_parser_process, initargs=(self.log_queue,))
+			else:
+				self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="parser")
+		if not self.workers:
+			self.queue = asyncio.Queue(maxsize=self.queue_size)
+			self.workers = [asyncio.create_task(self.worker()) for _ in range(self.max_workers)]
+
+	async def worker(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			args, future = await self.queue.get()
+			try:
+				if not future.cancelled():
+					self.start()
+					executor = self.executor
+					start = time.perf_counter()
+					result = await loop.run_in_executor(executor, parse_substitutions, *args)
+					metrics.observe("parse_duration_seconds", time.perf_counter() - start)
+					if not future.done():
+						future.set_result(result)
+			except BrokenProcessPool as e:
+				# Pula, której proces został zakończony (np. z braku pamięci), jest tworzona od nowa przy kolejnym przetwarzaniu
+				console_logger.error(f"Proces przetwarzający stronę został nieoczekiwanie zakończony. Pula procesów zostanie utworzona ponownie. Więcej informacji: {e}")
+				if self.executor is executor:
+					executor.shutdown(wait=False, cancel_futures=True)
+					self.executor = None
+				if not future.done():
+					future.set_exception(e)
+			except Exception as e:
+				if not future.done():
+					future.set_exception(e)
+			finally:
+				self.queue.task_done()
+
+	async def parse(self, *args):
+		self.start()
+		future = asyncio.get_running_loop().create_future()
+		try:
+			self.queue.put_nowait((args, future))
+		except asyncio.QueueFull:
+			console_logger.warning("Kolejka przetwarzania strony jest pełna. Pomijanie aktualizacji.")
+			return None
+		return await future
+
+	def shutdown(self):
+		for worker in self.workers:
+			worker.cancel()
+		self.workers = []
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
+			self.executor = None
+
+parser_backend = resolve_parser_backend(PARSER_BACKEND)
+parsing_service = ParsingService(PARSER_EXECUTOR, PARSER_WORKERS, PARSER_QUEUE_SIZE)
+
+# Szkoły, z których pobierane są zastępstwa
+class Source:
+	def __init__(self, source_id, definition):
+		self.id = source_id
+		self.name = definition.get("name", source_id)
+		self.teachers_cell_color = definition.get("teachers_cell_color", TEACHERS_CELL_COLOR)
+		self.classes_by_grade = definition["classes_by_grade"]
+		self.class_matcher = compile_class_matcher(self.classes_by_grade)
+		self.fetcher = WebsiteFetcher(source_id, definition["url"], definition.get("encoding", ENCODING))
+		self.last_processed_snapshot = None
+		# Serwery, do których nie dotarła ostatnio przetworzona strona, wraz z jej treścią
+		self.pending_parsed = None
+		self.pending_guild_ids = set()
+		# Odciski klas z ostatnio przetworzonej strony, z których korzysta powiadamianie subskrybentów
+		self.class_fingerprints = None
+
+	async def parse(self, text):
+		return await parsing_service.parse(text, self.teachers_cell_color, self.class_matcher)
+
+sources = {source_id: Source(source_id, definition) for source_id, definition in SOURCES.items()}
+
+def get_guild_source(guild_id):
+	return sources.get(config_service.get_guild(guild_id).get("source") or DEFAULT_SOURCE)
+
+# Filtrowanie zastępstw dla serwera
+def filter_entries(parsed, filter_classes):
+	if not filter_classes:
+		return [(title, section_entries) for title, section_entries in parsed.sections if title and section_entries], {}
+
+	# Filtrowanie sprowadza się do odczytu pozycji wybranych klas z indeksu
+	entries_by_section = {}
+	for section_index, entry_index in sorted({position for cls in filter_classes for position in parsed.class_index.get(cls, ())}):
+		entries_by_section.setdefault(section_index, []).append(parsed.sections[section_index][1][entry_index])
+	entries = [(parsed.sections[section_index][0], section_entries) for section_index, section_entries in entries_by_section.items() if parsed.sections[section_index][0]]
+
+	no_class_entries_by_teacher = {}
+	for section_index, entry_index in parsed.class_index.get(None, ()):
+		title, section_entries = parsed.sections[section_index]
+		no_class_entries_by_teacher.setdefault(title, []).append(section_entries[entry_index])
+
+	return entries, no_class_entries_by_teacher
+
+# Obsługa stanu serwerów
+class StateStore:
+	def __init__(self, path):
+		self.path = path
+		self.connection = None
+		self.lock = threading.Lock()
+		self.cache = {}
+		self.pending = {}
+
+	def open(self):
+		if self.connection is not None:
+			return
+		self.connection = sqlite3.connect(self.path, check_same_thread=False)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS guild_state (guild_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS bot_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+		self.connection.commit()
+
+		# Cały stan jest wczytywany jednorazowo, a kolejne odczyty korzystają z pamięci podręcznej
+		self.cache = {guild_id: json.loads(data) for guild_id, data in self.connection.execute("SELECT guild_id, data FROM guild_state")}
+		self.migrate_data_files()
+
+	def migrate_data_files(self):
+		# Jednorazowe przeniesienie stanu z plików previous_hash_*.json używanych przez wcześniejsze wersje bota
+		migrated = []
+		for file_path in glob.glob("previous_hash_*.json"):
+			guild_id = file_path[len("previous_hash_"):-len(".json")]
+			try:
 				with open(file_path, "r", encoding="utf-8") as file:
-					return json.load(file)
-			return {}
-	except IOError as e:
-		console_logger.error(f"Błąd podczas operacji na pliku z danymi: {e}")
-		return {}
-	
+					data = json.load(file)
+			except (IOError, json.JSONDecodeError) as e:
+				console_logger.error(f"Błąd podczas przenoszenia pliku z danymi {file_path}: {e}")
+				continue
+			if guild_id not in self.cache:
+				self.set(guild_id, data)
+			migrated.append(file_path)
+
+		if migrated:
+			self.write(self.serialize_pending())
+			for file_path in migrated:
+				os.replace(file_path, f"{file_path}.migrated")
+			console_logger.info(f"Przeniesiono {len(migrated)} plik(ów) z danymi do bazy {self.path}.")
+
+	def get(self, guild_id):
+		return self.cache.get(str(guild_id), {})
+
+	def set(self, guild_id, data):
+		self.cache[str(guild_id)] = data
+		self.pending[str(guild_id)] = data
+
+	def get_value(self, key):
+		with self.lock:
+			row = self.connection.execute("SELECT value FROM bot_state WHERE key = ?", (key,)).fetchone()
+		return row[0] if row else None
+
+	def set_value(self, key, value):
+		with self.lock, self.connection:
+			self.connection.execute("INSERT OR REPLACE INTO bot_state (key, value) VALUES (?, ?)", (key, value))
+
+	def serialize_pending(self):
+		pending, self.pending = self.pending, {}
+		return [(guild_id, json.dumps(data, ensure_ascii=False)) for guild_id, data in pending.items()]
+
+	def write(self, rows):
+		with self.lock, self.connection:
+			self.connection.executemany("INSERT OR REPLACE INTO guild_state (guild_id, data) VALUES (?, ?)", rows)
+
+	async def flush(self):
+		# Wszystkie zmiany z jednego cyklu są zapisywane w jednej transakcji poza pętlą zdarzeń
+		if not self.pending or self.connection is None:
+			return
+		rows = self.serialize_pending()
+		try:
+			await asyncio.to_thread(self.write, rows)
+		except sqlite3.Error as e:
+			console_logger.error(f"Błąd podczas zapisywania stanu serwerów: {e}")
+
+	def close(self):
+		if self.connection is not None:
+			if self.pending:
+				self.write(self.serialize_pending())
+			self.connection.close()
+			self.connection = None
+
+state_store = StateStore(STATE_DATABASE)
+
+# Subskrypcje klas użytkowników
+class SubscriptionService:
+	def __init__(self, store):
+		self.store = store
+		self.classes_by_user = {}
+		self.users_by_class = {}
+		self.data_version = None
+		self.write_lock = asyncio.Lock()
+
+	def open(self):
+		with self.store.lock, self.store.connection:
+			self.store.connection.execute("CREATE TABLE IF NOT EXISTS subscriptions (user_id TEXT NOT NULL, source TEXT NOT NULL, class TEXT NOT NULL, PRIMARY KEY (user_id, class))")
+		self.reload()
+
+	def reload(self):
+		with self.store.lock:
+			self.data_version = self.store.connection.execute("PRAGMA data_version").fetchone()[0]
+			rows = self.store.connection.execute("SELECT user_id, source, class FROM subscriptions").fetchall()
+
+		# Odwrócony indeks pozwala znaleźć odbiorców zmian w czasie zależnym od liczby zmienionych klas, a nie liczby subskrybentów
+		self.classes_by_user = {}
+		self.users_by_class = {}
+		for user_id, source_id, cls in rows:
+			self.classes_by_user.setdefault(user_id, (source_id, set()))[1].add(cls)
+			self.users_by_class.setdefault((source_id, cls), set()).add(user_id)
+
+	def refresh(self):
+		# Subskrypcje zmienione przez inne procesy zwiększają wersję bazy danych
+		if self.store.connection is None:
+			return
+		with self.store.lock:
+			data_version = self.store.connection.execute("PRAGMA data_version").fetchone()[0]
+		if data_version != self.data_version:
+			self.reload()
+
+	def get(self, user_id):
+		return self.classes_by_user.get(str(user_id))
+
+	async def subscribe(self, user_id, source_id, classes):
+		user_id = str(user_id)
+		self.remove_from_index(user_id)
+		self.classes_by_user[user_id] = (source_id, set(classes))
+		for cls in classes:
+			self.users_by_class.setdefault((source_id, cls), set()).add(user_id)
+		await self.write(user_id, [(user_id, source_id, cls) for cls in classes])
+
+	async def unsubscribe(self, user_id):
+		user_id = str(user_id)
+		self.remove_from_index(user_id)
+		await self.write(user_id, [])
+
+	async def write(self, user_id, rows):
+		# Indeks w pamięci jest aktualizowany od razu, a zapis odbywa się poza pętlą zdarzeń w kolejności wywołań
+		async with self.write_lock:
+			try:
+				await asyncio.to_thread(self.write_rows, user_id, rows)
+			except sqlite3.Error as e:
+				console_logger.error(f"Błąd podczas zapisywania subskrypcji użytkownika {user_id}: {e}")
+
+	def write_rows(self, user_id, rows):
+		with self.store.lock, self.store.connection:
+			self.store.connection.execute("DELETE FROM subscriptions WHERE user_id = ?", (user_id,))
+			self.store.connection.executemany("INSERT INTO subscriptions (user_id, source, class) VALUES (?, ?, ?)", rows)
+
+	def remove_from_index(self, user_id):
+		source_id, classes = self.classes_by_user.pop(user_id, (None, ()))
+		for cls in classes:
+			users = self.users_by_class.get((source_id, cls))
+			if users is not None:
+				users.discard(user_id)
+				if not users:
+					del self.users_by_class[(source_id, cls)]
+
+	def find_recipients(self, source_id, classes):
+		recipients = {}
+		for cls in classes:
+			for user_id in self.users_by_class.get((source_id, cls), ()):
+				recipients.setdefault(user_id, set()).add(cls)
+		return recipients
+
+	def count(self):
+		return len(self.classes_by_user)
+
+subscription_service = SubscriptionService(state_store)
+
+# Archiwum wersji strony z zastępstwami
+class SnapshotArchive:
+	def __init__(self, path):
+		self.path = path
+		self.connection = None
+		self.lock = threading.Lock()
+		self.latest = {}
+
+	def open(self):
+		if self.connection is not None or self.path is None:
+			return
+		self.connection = sqlite3.connect(self.path, check_same_thread=False)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		# Treść każdej wersji jest przechowywana raz pod swoim odciskiem, a wersje i nauczyciele są indeksowani osobno, bez rozpakowywania treści
+		self.connection.executescript("""
+			CREATE TABLE IF NOT EXISTS snapshots (hash TEXT PRIMARY KEY, content BLOB NOT NULL, size INTEGER NOT NULL, compressed_size INTEGER NOT NULL);
+			CREATE TABLE IF NOT EXISTS versions (id INTEGER PRIMARY KEY, source TEXT NOT NULL, fetched_at REAL NOT NULL, date TEXT NOT NULL, hash TEXT NOT NULL);
+			CREATE INDEX IF NOT EXISTS versions_by_date ON versions (source, date, fetched_at);
+			CREATE INDEX IF NOT EXISTS versions_by_time ON versions (source, fetched_at);
+			CREATE TABLE IF NOT EXISTS snapshot_teachers (teacher TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (teacher, hash)) WITHOUT ROWID;
+		""")
+		self.connection.commit()
+		self.latest = dict(self.connection.execute("SELECT source, hash FROM versions WHERE id IN (SELECT MAX(id) FROM versions GROUP BY source)"))
+
+	def is_latest(self, source_id, content_hash):
+		return self.latest.get(source_id) == content_hash
+
+	def store(self, source_id, text, content_hash, teachers, fetched_at):
+		date = datetime.fromtimestamp(fetched_at, TIMEZONE).strftime("%Y-%m-%d")
+		with self.lock, self.connection:
+			if self.connection.execute("SELECT 1 FROM snapshots WHERE hash = ?", (content_hash,)).fetchone() is None:
+				content = text.encode("utf-8")
+				compressed = zlib.compress(content, 9)
+				self.connection.execute("INSERT INTO snapshots (hash, content, size, compressed_size) VALUES (?, ?, ?, ?)", (content_hash, compressed, len(content), len(compressed)))
+				self.connection.executemany("INSERT OR IGNORE INTO snapshot_teachers (teacher, hash) VALUES (?, ?)", [(teacher, content_hash) for teacher in teachers])
+			self.connection.execute("INSERT INTO versions (source, fetched_at, date, hash) VALUES (?, ?, ?, ?)", (source_id, fetched_at, date, content_hash))
+		self.latest[source_id] = content_hash
+		self.prune(fetched_at)
+
+	def prune(self, now):
+		# Najnowsza wersja każdej szkoły jest zachowywana, aby kolejne pobrania tej samej treści nie były zapisywane ponownie
+		keep_latest = "id NOT IN (SELECT MAX(id) FROM versions GROUP BY source)"
+		with self.lock, self.connection:
+			self.connection.execute(f"DELETE FROM versions WHERE fetched_at < ? AND {keep_latest}", (now - ARCHIVE_RETENTION_DAYS * 86400,))
+			self.remove_orphans()
+			while (self.connection.execute("SELECT COALESCE(SUM(compressed_size), 0) FROM snapshots").fetchone()[0] > ARCHIVE_MAX_BYTES):
+				removed = self.connection.execute(f"DELETE FROM versions WHERE id IN (SELECT id FROM versions WHERE {keep_latest} ORDER BY fetched_at LIMIT 10)").rowcount
+				self.remove_orphans()
+				if not removed:
+					break
+
+	def remove_orphans(self):
+		self.connection.execute("DELETE FROM snapshots WHERE hash NOT IN (SELECT hash FROM versions)")
+		self.connection.execute("DELETE FROM snapshot_teachers WHERE hash NOT IN (SELECT hash FROM snapshots)")
+
+	def find_versions(self, source_id, date, teacher=None):
+		with self.lock:
+			if teacher:
+				# Znaki % i _ wpisane przez użytkownika są wyszukiwane dosłownie, a nie jako symbole wieloznaczne
+				pattern = teacher.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+				return self.connection.execute(
+					"SELECT DISTINCT versions.fetched_at, versions.hash FROM versions JOIN snapshot_teachers ON snapshot_teachers.hash = versions.hash "
+					"WHERE versions.source = ? AND versions.date = ? AND snapshot_teachers.teacher LIKE ? ESCAPE '\\' ORDER BY versions.fetched_at",
+					(source_id, date, f"%{pattern}%")
+				).fetchall()
+			return self.connection.execute("SELECT fetched_at, hash FROM versions WHERE source = ? AND date = ? ORDER BY fetched_at", (source_id, date)).fetchall()
+
+	def find_change_at(self, source_id, timestamp):
+		# Wersja obowiązująca w danej chwili oraz wersja, którą zastąpiła
+		with self.lock:
+			current = self.connection.execute("SELECT id, fetched_at, hash FROM versions WHERE source = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1", (source_id, timestamp)).fetchone()
+			if current is None:
+				return None, None
+			previous = self.connection.execute("SELECT fetched_at, hash FROM versions WHERE source = ? AND id < ? ORDER BY id DESC LIMIT 1", (source_id, current[0])).fetchone()
+		return current[1:], previous
+
+	def load(self, content_hash):
+		with self.lock:
+			row = self.connection.execute("SELECT content FROM snapshots WHERE hash = ?", (content_hash,)).fetchone()
+		return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+	def get_statistics(self):
+		with self.lock:
+			versions = self.connection.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+			snapshots, size, compressed_size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(compressed_size), 0) FROM snapshots").fetchone()
+		return versions, snapshots, size, compressed_size
+
+	def close(self):
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+snapshot_archive = SnapshotArchive(ARCHIVE_DATABASE)
+
+async def archive_snapshot(source, text, content_hash, parsed):
+	# Zapisywane są wyłącznie nowe wersje strony, więc niezmieniona strona nie zajmuje dodatkowego miejsca
+	if snapshot_archive.connection is None or snapshot_archive.is_latest(source.id, content_hash):
+		return
+	teachers = sorted({title for title, entries in parsed.sections if title})
+	try:
+		await asyncio.to_thread(snapshot_archive.store, source.id, text, content_hash, teachers, time.time())
+		console_logger.info(f"Zarchiwizowano nową wersję strony szkoły {source.name}.")
+	except sqlite3.Error as e:
+		console_logger.error(f"Błąd podczas archiwizowania strony szkoły {source.name}: {e}")
+
 # Główna klasa i logika
-class BOT(commands.Bot):
+def get_gateway_options(lean=LEAN_GATEWAY):
+	intents = discord.Intents.default()
+	intents.guilds = True
+	if not lean:
+		intents.members = True
+		return {"intents": intents}
+	# Bez listy członków serwerów, jej pobierania przy starcie oraz z ograniczoną liczbą przechowywanych wiadomości
+	return {
+		"intents": intents,
+		"member_cache_flags": discord.MemberCacheFlags.none(),
+		"chunk_guilds_at_startup": False,
+		"max_messages": MESSAGE_CACHE_SIZE or None
+	}
+
+# Przy włączonych shardach każdy proces łączy się z Discordem wyłącznie przez swoje shardy
+class BOT(commands.AutoShardedBot if SHARD_COUNT else commands.Bot):
 	def __init__(self):
-		intents = discord.Intents.default()
-		intents.guilds = True
-		intents.members = True 
-		super().__init__(command_prefix="", intents=intents)
+		shard_options = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS} if SHARD_COUNT else {}
+		super().__init__(command_prefix="", **get_gateway_options(), **shard_options)
 		self.start_time = None
-	
+		self.metrics_runner = None
+		self.loop_lag_task = None
+
+	async def setup_hook(self):
+		# setup_hook wykonuje się raz na cały czas działania procesu, w przeciwieństwie do on_ready wywoływanego po każdym ponownym połączeniu
+		state_store.open()
+		subscription_service.open()
+		snapshot_archive.open()
+		self.metrics_runner = await start_metrics_server() if METRICS_PORT else None
+		self.loop_lag_task = self.loop.create_task(monitor_event_loop_lag())
+		updater_service.start()
+		await self.sync_command_tree()
+
+	async def sync_command_tree(self):
+		# Komendy są przesyłane do Discorda wyłącznie wtedy, gdy zmieniły się od ostatniej synchronizacji
+		commands_data = [command.to_dict(self.tree) for command in self.tree.get_commands()]
+		fingerprint = calculate_fingerprint(json.dumps(commands_data, sort_keys=True, ensure_ascii=False))
+		key = f"command_tree:{self.application_id}"
+		if state_store.get_value(key) == fingerprint:
+			console_logger.info("Komendy nie zmieniły się od ostatniej synchronizacji. Pomijanie synchronizacji.")
+			return
+		try:
+			await self.tree.sync()
+		except discord.HTTPException as e:
+			console_logger.error(f"Nie udało się zsynchronizować komend. Więcej informacji: {e}")
+			return
+		state_store.set_value(key, fingerprint)
+		console_logger.info(f"Zsynchronizowano {len(commands_data)} komend(y).")
+
 	async def on_ready(self):
 		console_logger.info(f"Zalogowano jako {self.user.name} ({self.user.id})")
-		await self.tree.sync()
-		self.loop.create_task(check_for_updates())
-		self.start_time = datetime.now()
+		if self.start_time is None:
+			self.start_time = datetime.now()
+
+	async def close(self):
+		updater_service.stop()
+		direct_message_queue.shutdown()
+		if self.loop_lag_task:
+			self.loop_lag_task.cancel()
+		if self.metrics_runner:
+			await self.metrics_runner.cleanup()
+		await http_session.close()
+		await webhook_sender.close()
+		parsing_service.shutdown()
+		await super().close()
+		await config_service.flush()
+		state_store.close()
+		snapshot_archive.close()
 		
 	def get_server_count(self):
 		return len(self.guilds)
@@ -265,9 +1358,20 @@ class BOT(commands.Bot):
 bot = BOT()
 
 # Funkcja wysyłająca instrukcję administratorom serwera
+async def get_guild_admins(guild):
+	if not LEAN_GATEWAY:
+		return [member for member in guild.members if member.guild_permissions.administrator and not member.bot]
+
+	# Bez listy członków serwera instrukcję otrzymuje właściciel serwera, pobierany na żądanie
+	try:
+		return [guild.owner or await guild.fetch_member(guild.owner_id)]
+	except discord.HTTPException as e:
+		console_logger.error(f"Nie udało się pobrać właściciela serwera {guild.name}. Więcej informacji: {e}")
+		return []
+
 @bot.event
 async def on_guild_join(guild):
-	admins = [member for member in guild.members if member.guild_permissions.administrator and not member.bot]
+	admins = await get_guild_admins(guild)
 	for admin in admins:
 		embed = discord.Embed(
 			title="**Cześć! Nadszedł czas na skonfigurowanie bota!**",
@@ -282,156 +1386,844 @@ async def on_guild_join(guild):
 		except discord.Forbidden as e:
 			console_logger.error(f"Nie można wysłać wiadomości do {admin.name}, który jest administratorem na serwerze {guild.name}. Więcej informacji: {e}")
 
+# Harmonogram sprawdzania aktualizacji
+class PollingScheduler:
+	def __init__(self):
+		self.change_check_until = None
+		self.consecutive_errors = 0
+
+	def base_interval(self, now):
+		for weekdays, start_hour, end_hour, interval in POLLING_WINDOWS:
+			if now.weekday() in weekdays and start_hour <= now.hour < end_hour:
+				return interval
+		return CHECK_INTERVAL
+
+	def record_success(self, changed, now=None):
+		self.consecutive_errors = 0
+		if changed:
+			self.change_check_until = (now or datetime.now(TIMEZONE)) + timedelta(seconds=CHANGE_CHECK_DURATION)
+
+	def record_error(self):
+		self.consecutive_errors += 1
+
+	def next_interval(self, now=None):
+		now = now or datetime.now(TIMEZONE)
+		interval = self.base_interval(now)
+		if self.change_check_until and now < self.change_check_until:
+			interval = min(interval, CHANGE_CHECK_INTERVAL)
+		if self.consecutive_errors:
+			interval = max(interval, min(60 * 2 ** (self.consecutive_errors - 1), ERROR_BACKOFF_MAX))
+		interval *= random.uniform(1 - POLLING_JITTER, 1 + POLLING_JITTER)
+
+		# Oczekiwanie nie przekracza początku przedziału z częstszym sprawdzaniem
+		next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+		if not self.consecutive_errors and self.base_interval(next_hour) < self.base_interval(now):
+			interval = min(interval, (next_hour - now).total_seconds())
+		return interval
+
+polling_scheduler = PollingScheduler()
+
+# Wspólne przygotowanie zastępstw dla serwerów z takim samym filtrem klas
+def get_filter_signature(filter_classes):
+	# Kolejność i powtórzenia wybranych klas nie zmieniają wyniku filtrowania
+	return tuple(sorted(set(filter_classes or ())))
+
+def calculate_parsed_fingerprint(parsed):
+	return calculate_fingerprint(json.dumps([parsed.additional_info, parsed.sections], ensure_ascii=False))
+
+class RenderedSubstitutions:
+	def __init__(self, parsed, filter_classes):
+		self.additional_info = parsed.additional_info
+		self.current_entries, self.no_class_entries_by_teacher = filter_entries(parsed, filter_classes)
+		self.blocks = build_blocks(self.current_entries, self.no_class_entries_by_teacher)
+		self.state = build_state(self.additional_info, self.current_entries, self.no_class_entries_by_teacher, self.blocks)
+		self.block_embeds = None
+		self.serialized_embeds = {}
+
+	def get_block_embeds(self):
+		# Embedy są budowane dopiero wtedy, gdy pierwszy serwer z tym filtrem wymaga wysłania zmian
+		if self.block_embeds is None:
+			self.block_embeds = []
+			for kind, title, entries in self.blocks.values():
+				self.block_embeds.extend(build_block_embeds(kind, title, entries))
+			self.serialized_embeds = {id(embed): serialize_embed(embed) for embed in self.block_embeds}
+		return self.block_embeds
+
+class RenderCache:
+	def __init__(self, size):
+		self.size = size
+		self.items = {}
+
+	def get(self, parsed, content_hash, signature):
+		# Ostatnio używane wersje trafiają na koniec słownika, a po przekroczeniu rozmiaru usuwane są najdawniej używane
+		key = (content_hash, signature)
+		rendered = self.items.pop(key, None)
+		if rendered is None:
+			rendered = RenderedSubstitutions(parsed, signature)
+			metrics.increment("render_cache_total", result="miss")
+		else:
+			metrics.increment("render_cache_total", result="hit")
+		self.items[key] = rendered
+		while len(self.items) > self.size:
+			del self.items[next(iter(self.items))]
+		return rendered
+
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+
+# Przetwarzanie aktualizacji dla pojedynczego serwera
+async def process_guild(guild_id, rendered, current_time):
+	channel_id = config_service.get_guild(guild_id).get("channel_id")
+	if not channel_id:
+		console_logger.warning(f"Nie ustawiono ID kanału dla serwera {guild_id}.")
+		metrics.increment("guilds_total", result="skipped")
+		return "skipped"
+
+	channel = bot.get_channel(int(channel_id))
+	if not channel:
+		# Kanał może być chwilowo niedostępny (np. podczas awarii serwera), więc serwer zostanie obsłużony ponownie w kolejnym cyklu
+		console_logger.warning(f"Nie znaleziono kanału z ID {channel_id} dla serwera {guild_id}.")
+		metrics.increment("guilds_total", result="channel_missing")
+		return "channel_missing"
+	console_logger.info(f"Sprawdzanie aktualizacji dla serwera {guild_id}.")
+	channel = webhook_sender.get_channel(guild_id, channel)
+
+	try:
+		start = time.perf_counter()
+		previous_data = state_store.get(guild_id)
+		current_state = rendered.state
+		console_logger.info(f"Wyodrębniono {len(rendered.current_entries)} wpis(ów) z przypisanymi klasami oraz {len(rendered.no_class_entries_by_teacher)} wpis(ów) bez przypisanych klas dla serwera {guild_id}.")
+
+		# Porównywanie odcisków nowo pobranych danych z zapisanymi
+		diff = diff_states(previous_data, current_state)
+		metrics.observe("diff_duration_seconds", time.perf_counter() - start)
+
+		if diff.has_changes():
+			console_logger.info(f"Treść uległa zmianie dla serwera {guild_id} (nowe: {diff.added}, zmienione: {diff.modified}, usunięte: {diff.removed}). Wysyłam nowe aktualizacje.")
+			messages = dict(previous_data.get("messages", {}))
+			delivered = False
+			try:
+				await send_updates(channel, diff, rendered, current_time, messages)
+				delivered = True
+			except Exception as e:
+				# Obejmuje również błędy sieci (OSError, aiohttp.ClientError) i przekroczenie czasu, które discord.py przekazuje bez opakowania
+				console_logger.error(f"Nie udało się wysłać wszystkich wiadomości na serwer {guild_id}, hash nie zostanie zaktualizowany. Więcej informacji: {e}")
+				metrics.increment("guilds_total", result="failed")
+				return "failed"
+			finally:
+				# Identyfikatory wysłanych już wiadomości są zapisywane przy każdym wyniku, aby kolejna próba je edytowała zamiast dublować
+				state_store.set(guild_id, {**(current_state if delivered else previous_data), "messages": messages})
+			metrics.increment("guilds_total", result="sent")
+			return "sent"
+		console_logger.info(f"Treść się nie zmieniła dla serwera {guild_id}. Brak nowych aktualizacji.")
+		metrics.increment("guilds_total", result="unchanged")
+		return "unchanged"
+	except Exception as e:
+		console_logger.error(f"Błąd podczas przetwarzania aktualizacji dla serwera {guild_id}: {e}")
+		metrics.increment("guilds_total", result="failed")
+		return "failed"
+
+# Równoległe wysyłanie aktualizacji na serwery
+# Limity zapytań poszczególnych tras API Discorda obsługuje discord.py, a semafor ogranicza liczbę jednocześnie obsługiwanych serwerów wszystkich szkół
+# Webhooki nie podlegają globalnemu limitowi bota, więc w trybie WEBHOOK_DELIVERY jednocześnie obsługiwanych jest więcej serwerów
+dispatch_semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY if WEBHOOK_DELIVERY else DISPATCH_CONCURRENCY)
+
+async def dispatch_updates(guild_ids, parsed, current_time):
+	async def process_with_limit(guild_id, rendered):
+		async with dispatch_semaphore:
+			return await process_guild(guild_id, rendered, current_time)
+
+	start = time.perf_counter()
+
+	# Serwery są grupowane według filtra klas, a każda grupa korzysta z jednej przefiltrowanej i przygotowanej wersji zastępstw
+	content_hash = calculate_parsed_fingerprint(parsed)
+	signatures = {guild_id: get_filter_signature(config_service.get_guild(guild_id).get("selected_classes")) for guild_id in guild_ids}
+	rendered_by_signature = {signature: render_cache.get(parsed, content_hash, signature) for signature in set(signatures.values())}
+
+	results = await asyncio.gather(*(process_with_limit(guild_id, rendered_by_signature[signatures[guild_id]]) for guild_id in guild_ids))
+	metrics.observe("dispatch_duration_seconds", time.perf_counter() - start)
+	console_logger.info(f"Obsłużono {len(guild_ids)} serwer(ów) z {len(rendered_by_signature)} różnymi filtrami klas w {time.perf_counter() - start:.2f} s.")
+	return results
+
+# Powiadamianie subskrybentów o zmianach ich klas
+def calculate_class_fingerprints(parsed):
+	fingerprints = {}
+	for cls, positions in parsed.class_index.items():
+		if cls is None:
+			continue
+		fingerprints[cls] = calculate_fingerprint("\x1e".join(f"{parsed.sections[section_index][0]}\x1f{parsed.sections[section_index][1][entry_index].fingerprint()}" for section_index, entry_index in positions))
+	return fingerprints
+
+async def notify_subscribers(source, parsed):
+	if state_store.connection is None:
+		return
+	subscription_service.refresh()
+
+	# Odciski klas z poprzedniej wersji strony są zapisywane w bazie, aby ponowne uruchomienie bota nie powodowało powiadomień o starych zmianach
+	key = f"class_fingerprints:{source.id}"
+	current_fingerprints = calculate_class_fingerprints(parsed)
+	previous_fingerprints = source.class_fingerprints
+	if previous_fingerprints is None:
+		stored_fingerprints = await asyncio.to_thread(state_store.get_value, key)
+		previous_fingerprints = json.loads(stored_fingerprints) if stored_fingerprints is not None else None
+	source.class_fingerprints = current_fingerprints
+	try:
+		await asyncio.to_thread(state_store.set_value, key, json.dumps(current_fingerprints, ensure_ascii=False))
+	except sqlite3.Error as e:
+		console_logger.error(f"Błąd podczas zapisywania odcisków klas szkoły {source.name}: {e}")
+	if previous_fingerprints is None:
+		return
+
+	changed_classes = {cls for cls in current_fingerprints.keys() | previous_fingerprints.keys() if current_fingerprints.get(cls) != previous_fingerprints.get(cls)}
+	recipients = subscription_service.find_recipients(source.id, changed_classes)
+	if not recipients:
+		return
+	console_logger.info(f"Zmieniły się zastępstwa {len(changed_classes)} klas(y) szkoły {source.name}. Powiadamianie {len(recipients)} subskrybent(ów).")
+	for user_id, user_changed_classes in recipients.items():
+		subscription = subscription_service.get(user_id)
+		if subscription:
+			direct_message_queue.put(user_id, source, parsed, subscription[1], user_changed_classes)
+
 # Funkcja sprawdzająca aktualizacje
 async def check_for_updates():
-	await bot.wait_until_ready()
+	if RUN_MODE == "shard":
+		# Shardy znają swoje numery dopiero po połączeniu z Discordem
+		await bot.wait_until_ready()
+		shard_count = bot.shard_count or 1
+		await update_subscriber.run(bot.shard_ids or range(shard_count), shard_count)
+	else:
+		await poll_for_updates()
+
+async def poll_for_updates():
 	while not bot.is_closed():
-		current_time = get_current_time()
-		for guild_id_str in config.get("allowed_guilds", []):
-			guild_id = int(guild_id_str)
-			channel_id = guild_config.get(str(guild_id), {}).get("channel_id")
-			previous_data = manage_data_file(guild_id)
-			
-			if not channel_id:
-				console_logger.warning(f"Nie ustawiono ID kanału dla serwera {guild_id}.")
-				continue
+		await run_update_cycle()
+		interval = polling_scheduler.next_interval()
+		console_logger.info(f"Kolejne sprawdzenie aktualizacji za {interval:.0f} s.")
+		await asyncio.sleep(interval)
+
+def group_guilds_by_source():
+	guilds_by_source = {}
+	for guild_id in config_service.get_allowed_guilds():
+		source = get_guild_source(guild_id)
+		if source is None:
+			console_logger.warning(f"Nieznana szkoła przypisana do serwera {guild_id}.")
+			continue
+		guilds_by_source.setdefault(source, []).append(int(guild_id))
+	return guilds_by_source
+
+first_poll_time = None
+
+async def run_update_cycle():
+	global first_poll_time
+	start = time.perf_counter()
+	if first_poll_time is None:
+		first_poll_time = start - process_start_time
+		metrics.set_gauge("startup_to_first_poll_seconds", first_poll_time)
+		console_logger.info(f"Pierwsze sprawdzenie aktualizacji rozpoczęto {first_poll_time:.2f} s od uruchomienia procesu.")
+	current_time = get_current_time()
+	if RUN_MODE == "poller":
+		config_service.reload_if_changed()
+	semaphore = asyncio.Semaphore(SOURCE_CONCURRENCY)
+
+	# Strona każdej szkoły jest pobierana i przetwarzana raz na cykl, a wynik jest współdzielony przez jej serwery
+	async def process_with_limit(source, guild_ids):
+		async with semaphore:
+			return await process_source(source, guild_ids, current_time)
+
+	guilds_by_source = group_guilds_by_source()
+	results = await asyncio.gather(*(process_with_limit(source, guild_ids) for source, guild_ids in guilds_by_source.items()))
+
+	# Błędy jednej szkoły nie spowalniają sprawdzania pozostałych, dlatego czas oczekiwania wydłuża się dopiero, gdy zawiodą wszystkie
+	if results and all(result in ("fetch_error", "parse_error") for result, _ in results):
+		polling_scheduler.record_error()
+	else:
+		polling_scheduler.record_success(any("sent" in guild_results for _, guild_results in results))
+	await state_store.flush()
 
-			channel = bot.get_channel(int(channel_id))
-			if not channel:
-				console_logger.warning(f"Nie znaleziono kanału z ID {channel_id} dla serwera {guild_id}.")
-				continue
-			console_logger.info(f"Sprawdzanie aktualizacji dla serwera {guild_id}.")
+	outcomes = {result for result, _ in results}
+	result = next((outcome for outcome in ("processed", "unchanged", "queue_full", "parse_error", "fetch_error") if outcome in outcomes), "idle")
+	metrics.increment("cycles_total", result=result)
+	metrics.observe("cycle_duration_seconds", time.perf_counter() - start)
 
-			try:
-				soup = fetch_website_content(URL)
-				if soup is None:
-					console_logger.warning("Nie udało się pobrać zawartości strony. Pomijanie aktualizacji.")
-					continue
+async def process_source(source, guild_ids, current_time):
+	try:
+		result = await source.fetcher.fetch()
+		if result.text is None:
+			console_logger.warning(f"Nie udało się pobrać zawartości strony szkoły {source.name}. Pomijanie aktualizacji.")
+			return "fetch_error", []
+
+		# Niezmieniona strona przy niezmienionej konfiguracji nie wymaga przetwarzania ani odczytu stanu serwerów
+		snapshot = (calculate_snapshot_fingerprint(result.text), config_service.version)
+		if snapshot == source.last_processed_snapshot:
+			# Serwery, do których strona nie dotarła, otrzymują ponownie jej zapamiętaną treść bez ponownego przetwarzania
+			retry_guild_ids = [guild_id for guild_id in guild_ids if guild_id in source.pending_guild_ids]
+			if not retry_guild_ids:
+				source.pending_parsed, source.pending_guild_ids = None, set()
+				console_logger.info(f"Treść strony szkoły {source.name} nie zmieniła się od ostatniego przetworzenia. Brak nowych aktualizacji.")
+				return "unchanged", []
+			console_logger.info(f"Ponowne wysyłanie zastępstw szkoły {source.name} na {len(retry_guild_ids)} serwer(y), na które nie dotarły.")
+			guild_results, pending_guild_ids = await deliver_parsed(source, retry_guild_ids, source.pending_parsed, current_time)
+			source.pending_guild_ids = pending_guild_ids
+			if not pending_guild_ids:
+				source.pending_parsed = None
+			return "processed", guild_results
+
+		parsed = await source.parse(result.text)
+		if parsed is None:
+			return "queue_full", []
+		if not parsed.sections:
+			# Poprawnie przetworzona strona zawsze ma co najmniej jedną sekcję, więc brak sekcji oznacza pustą lub niepoprawną treść
+			console_logger.warning(f"Nie udało się wyodrębnić zastępstw ze strony szkoły {source.name}. Pomijanie aktualizacji.")
+			return "parse_error", []
+		metrics.set_gauge("entries_extracted", sum(len(entries) for _, entries in parsed.sections), source=source.id)
+		await archive_snapshot(source, result.text, snapshot[0], parsed)
+	except Exception as e:
+		console_logger.error(f"Błąd podczas pobierania lub przetwarzania strony szkoły {source.name}: {e}")
+		return "parse_error", []
 
-				filter_classes = guild_config.get(str(guild_id), {}).get("selected_classes", [])
-				additional_info, current_entries, no_class_entries_by_teacher = extract_data_from_html(soup, filter_classes, classes_by_grade)
-
-				# Kalkulacja hashu nowo pobranych danych
-				current_additional_info_hash = calculate_hash_from_data(additional_info)
-				current_entries_hash = calculate_hash_from_data(current_entries)
-				current_no_class_entries_by_teacher_hash = calculate_hash_from_data(no_class_entries_by_teacher)
-
-				# Pobieranie starego hashu z pliku danych
-				previous_additional_info_hash = previous_data.get("additional_info_hash", "")
-				previous_entries_hash = previous_data.get("entries_hash", "")
-				previous_no_class_entries_by_teacher_hash = previous_data.get("no_class_entries_by_teacher_hash", "")
-
-				# Porównywanie nowego hashu ze starym hashem
-				additional_info_changed = current_additional_info_hash != previous_additional_info_hash
-				entries_changed = current_entries_hash != previous_entries_hash
-				no_class_entries_by_teacher_changed = current_no_class_entries_by_teacher_hash != previous_no_class_entries_by_teacher_hash
-
-				if additional_info_changed or entries_changed or no_class_entries_by_teacher_changed:
-					console_logger.info("Treść uległa zmianie. Wysyłam nowe aktualizacje.")
-					try:
-						if additional_info_changed and not entries_changed and not no_class_entries_by_teacher_changed:
-							await send_updates(channel, additional_info, None, None, current_time)
-
-						elif entries_changed or no_class_entries_by_teacher_changed:
-							await send_updates(channel, additional_info, current_entries, no_class_entries_by_teacher, current_time)
-
-						new_data = {
-							"additional_info_hash": current_additional_info_hash,
-							"entries_hash": current_entries_hash,
-							"no_class_entries_by_teacher_hash": current_no_class_entries_by_teacher_hash
-						}
-						manage_data_file(guild_id, new_data)
-					except discord.DiscordException as e:
-						console_logger.error(f"Nie udało się wysłać wszystkich wiadomości, hash nie zostanie zaktualizowany. Więcej informacji: {e}")
-				else:
-					console_logger.info("Treść się nie zmieniła. Brak nowych aktualizacji.")
-
-				await asyncio.sleep(random.uniform(10, 15))
-			except Exception as e:
-				console_logger.error(f"Błąd podczas przetwarzania aktualizacji: {e}")
+	guild_results, pending_guild_ids = await deliver_parsed(source, guild_ids, parsed, current_time)
+	if update_publisher is None:
+		await notify_subscribers(source, parsed)
 
-		await asyncio.sleep(CHECK_INTERVAL)
+	# Strona jest zawsze oznaczana jako przetworzona, a kolejne cykle wysyłają ją wyłącznie na serwery, do których nie dotarła
+	source.last_processed_snapshot = snapshot
+	source.pending_parsed = parsed if pending_guild_ids else None
+	source.pending_guild_ids = pending_guild_ids
+	return "processed", guild_results
 
-# Funkcja wysyłająca aktualizacje
-async def send_updates(channel, additional_info, current_entries, no_class_entries_by_teacher, current_time):
-	description_only_for_additional_info = f"**Dodatkowe informacje zastępstw:**\n{additional_info}\n\n**Informacja o tej wiadomości:**\nW tej wiadomości znajdują się informacje dodatkowe, które zostały umieszczone przed zastępstwami. Nie znaleziono dla twojej klasy żadnych zastępstw, więc nie dostaniesz powiadomienia."
-	description_for_additional_info = f"**Dodatkowe informacje zastępstw:**\n{additional_info}\n\n**Informacja o tej wiadomości:**\nW tej wiadomości znajdują się informacje dodatkowe, które zostały umieszczone przed zastępstwami. Wszystkie zastępstwa znajdują się pod tą wiadomością."
-	description_for_entries = "\n### Informacja o tej wiadomości:\nTe zastępstwa nie posiadają dołączonej klasy, więc zweryfikuj czy przypadkiem nie dotyczą one Ciebie!"
+RETRY_RESULTS = ("failed", "channel_missing")
 
-	try:
-		last_message = None
-		if additional_info and not current_entries and not no_class_entries_by_teacher:
-			embed = discord.Embed(
-				title="**Zastępstwa zostały zaktualizowane!**",
-				description=description_only_for_additional_info,
-				color=EMBEDS_COLOR
-			)
-			embed.set_footer(text=f"Czas aktualizacji: {current_time}\nStworzone z ❤️ przez Kacpra Górkę!")
-			await channel.send(embed=embed)
+async def deliver_parsed(source, guild_ids, parsed, current_time):
+	if update_publisher is not None:
+		return await update_publisher.publish(source, guild_ids, parsed, current_time)
 
-		elif (additional_info and no_class_entries_by_teacher and not current_entries) or (no_class_entries_by_teacher and not current_entries):
-			ping_message = "@everyone Zastępstwa zostały zaktualizowane!"
-			ping_msg = await channel.send(ping_message)
-			await asyncio.sleep(5)
-			await ping_msg.delete()
+	# Strona jest pobierana i przetwarzana już podczas łączenia z Discordem, a na wysłanie czeka dopiero gotowa treść
+	await bot.wait_until_ready()
+	guild_results = await dispatch_updates(guild_ids, parsed, current_time)
+	return guild_results, {guild_id for guild_id, result in zip(guild_ids, guild_results) if result in RETRY_RESULTS}
+
+# Przekazywanie zastępstw między procesem pobierającym a procesami shardów
+PUBLISHER_LINE_LIMIT = 64 * 1024 * 1024
+
+def serialize_parsed(parsed):
+	return {
+		"additional_info": parsed.additional_info,
+		"sections": [[title, [list(entry) for entry in entries]] for title, entries in parsed.sections],
+		"class_index": [[cls, positions] for cls, positions in parsed.class_index.items()]
+	}
+
+def deserialize_parsed(data):
+	sections = [(title, [Substitution(*entry[:5], tuple(entry[5])) for entry in entries]) for title, entries in data["sections"]]
+	class_index = {cls: [tuple(position) for position in positions] for cls, positions in data["class_index"]}
+	return ParsedSubstitutions(data["additional_info"], sections, class_index)
+
+def get_shard_id(guild_id, shard_count):
+	return (int(guild_id) >> 22) % shard_count
+
+async def send_line(writer, message):
+	writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+	await writer.drain()
+
+class UpdatePublisher:
+	def __init__(self, host, port):
+		self.host = host
+		self.port = port
+		self.server = None
+		self.shards = {}
+		self.publications = {}
+		self.publication_id = 0
+
+	async def start(self):
+		self.server = await asyncio.start_server(self.handle_shard, self.host, self.port, limit=PUBLISHER_LINE_LIMIT)
+		console_logger.info(f"Zastępstwa są przekazywane procesom shardów pod adresem {self.host}:{self.port}.")
+
+	async def handle_shard(self, reader, writer):
+		try:
+			hello = json.loads(await reader.readline())
+			self.shards[writer] = (set(hello["shard_ids"]), hello["shard_count"])
+			console_logger.info(f"Połączono proces obsługujący shardy {hello['shard_ids']} z {hello['shard_count']}.")
+
+			# Nowy proces otrzymuje aktualne zastępstwa w najbliższym cyklu, a zapisany stan serwerów zapobiega ich dublowaniu
+			for source in sources.values():
+				source.last_processed_snapshot = None
+
+			while line := await reader.readline():
+				message = json.loads(line)
+				self.complete(message["id"], writer, message["results"], message.get("retry_guild_ids", []))
+		except (ConnectionError, ValueError, KeyError) as e:
+			console_logger.warning(f"Błąd połączenia z procesem shardów: {e}")
+		finally:
+			self.shards.pop(writer, None)
+			# Serwery procesu, który się rozłączył, są traktowane jak nieobsłużone
+			for publication_id in list(self.publications):
+				self.complete(publication_id, writer, ["failed"], self.publications[publication_id]["guild_ids"])
+			writer.close()
+			console_logger.warning("Rozłączono proces shardów.")
+
+	def complete(self, publication_id, writer, results, retry_guild_ids):
+		publication = self.publications.get(publication_id)
+		if publication is None or writer not in publication["waiting"]:
+			return
+		publication["waiting"].discard(writer)
+		publication["results"].extend(results)
+		publication["retry_guild_ids"].update(retry_guild_ids)
+		if not publication["waiting"] and not publication["done"].done():
+			publication["done"].set_result(None)
+
+	def covers_all_shards(self):
+		if not self.shards:
+			return False
+		shard_count = max(shard_count for _, shard_count in self.shards.values())
+		covered = set().union(*(shard_ids for shard_ids, _ in self.shards.values()))
+		return covered >= set(range(shard_count))
+
+	async def publish(self, source, guild_ids, parsed, current_time):
+		# Bez kompletu shardów część serwerów nie dostałaby aktualizacji, więc wszystkie serwery otrzymają stronę ponownie w kolejnym cyklu
+		# Serwery, które już ją otrzymały, nie mają wtedy zmian, więc ponowne wysłanie niczego nie dubluje
+		covers_all_shards = self.covers_all_shards()
+		results = [] if covers_all_shards else ["failed"]
+		retry_guild_ids = set() if covers_all_shards else set(guild_ids)
+		if not self.shards:
+			console_logger.warning("Brak połączonych procesów shardów. Zastępstwa zostaną przekazane w kolejnym cyklu.")
+			return results, retry_guild_ids
+
+		# Szkoły są przekazywane równolegle, więc każda publikacja korzysta z własnego identyfikatora
+		self.publication_id += 1
+		publication_id = self.publication_id
+		publication = {"waiting": set(self.shards), "guild_ids": guild_ids, "results": results, "retry_guild_ids": retry_guild_ids, "done": asyncio.get_running_loop().create_future()}
+		self.publications[publication_id] = publication
+		message = {"id": publication_id, "source": source.id, "guild_ids": guild_ids, "current_time": current_time, "parsed": serialize_parsed(parsed)}
+		try:
+			for writer in list(publication["waiting"]):
+				try:
+					await send_line(writer, message)
+				except ConnectionError:
+					self.complete(publication_id, writer, ["failed"], guild_ids)
+			await asyncio.wait_for(asyncio.shield(publication["done"]), PUBLISHER_TIMEOUT)
+		except asyncio.TimeoutError:
+			console_logger.warning(f"Procesy shardów nie wysłały zastępstw szkoły {source.name} w ciągu {PUBLISHER_TIMEOUT} s.")
+			results.append("failed")
+			retry_guild_ids.update(guild_ids)
+		finally:
+			self.publications.pop(publication_id, None)
+		return results, retry_guild_ids
+
+	async def close(self):
+		if self.server is not None:
+			self.server.close()
+			for writer in list(self.shards):
+				writer.close()
+			await self.server.wait_closed()
+
+class UpdateSubscriber:
+	def __init__(self, host, port):
+		self.host = host
+		self.port = port
+
+	async def run(self, shard_ids, shard_count):
+		shard_ids = list(shard_ids)
+		delay = 1
+		while not bot.is_closed():
+			try:
+				reader, writer = await asyncio.open_connection(self.host, self.port, limit=PUBLISHER_LINE_LIMIT)
+				console_logger.info(f"Połączono z procesem pobierającym zastępstwa jako shardy {shard_ids} z {shard_count}.")
+				delay = 1
+				try:
+					await send_line(writer, {"shard_ids": shard_ids, "shard_count": shard_count})
+					while line := await reader.readline():
+						message = json.loads(line)
+						results, retry_guild_ids = await self.deliver(message, set(shard_ids), shard_count)
+						await send_line(writer, {"id": message["id"], "results": results, "retry_guild_ids": retry_guild_ids})
+				finally:
+					writer.close()
+				console_logger.warning("Proces pobierający zastępstwa zakończył połączenie.")
+			except (OSError, ValueError) as e:
+				console_logger.warning(f"Nie udało się połączyć z procesem pobierającym zastępstwa: {e}")
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, 60)
+
+	async def deliver(self, message, shard_ids, shard_count):
+		# Proces obsługuje wyłącznie serwery należące do jego shardów
+		config_service.reload_if_changed()
+		parsed = deserialize_parsed(message["parsed"])
+		guild_ids = [guild_id for guild_id in message["guild_ids"] if get_shard_id(guild_id, shard_count) in shard_ids and config_service.is_guild_allowed(guild_id)]
+		results = await dispatch_updates(guild_ids, parsed, message["current_time"]) if guild_ids else []
+		await state_store.flush()
+
+		# Wiadomości prywatne do subskrybentów wysyła wyłącznie proces obsługujący shard 0
+		source = sources.get(message["source"])
+		if 0 in shard_ids and source is not None:
+			await notify_subscribers(source, parsed)
+		return results, [guild_id for guild_id, result in zip(guild_ids, results) if result in RETRY_RESULTS]
+
+update_publisher = None
+update_subscriber = UpdateSubscriber(PUBLISHER_HOST, PUBLISHER_PORT)
+updater_service = BackgroundService("aktualizacje", check_for_updates)
+
+async def run_poller():
+	global update_publisher
+	snapshot_archive.open()
+	update_publisher = UpdatePublisher(PUBLISHER_HOST, PUBLISHER_PORT)
+	await update_publisher.start()
+	metrics_runner = await start_metrics_server() if METRICS_PORT else None
+	loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+	updater_service.start()
+	try:
+		await updater_service.task
+	finally:
+		updater_service.stop()
+		loop_lag_task.cancel()
+		if metrics_runner:
+			await metrics_runner.cleanup()
+		await update_publisher.close()
+		await http_session.close()
+		parsing_service.shutdown()
+		snapshot_archive.close()
 
-			embed = discord.Embed(
-				title="**Zastępstwa zostały zaktualizowane!**",
-				description=description_for_additional_info,
-				color=EMBEDS_COLOR
-			)
-			embed.set_footer(text=f"Czas aktualizacji: {current_time}\nStworzone z ❤️ przez Kacpra Górkę!")
-			await channel.send(embed=embed)
+# Funkcja wysyłająca aktualizacje
+def describe_changes(diff):
+	summary = f"\n\n**Podsumowanie zmian:**\nNowe zastępstwa: **{diff.added}**, zmienione: **{diff.modified}**, usunięte: **{diff.removed}**."
+	if diff.removed_blocks:
+		teachers = ", ".join(f"**{key.split(':', 1)[1] or 'Brak nauczyciela'}**" for key in diff.removed_blocks)
+		summary += f"\nUsunięto wszystkie zastępstwa za: {teachers}."
+	return summary
+
+# Dzielenie i pakowanie embedów w granicach limitów Discorda
+def split_description(text, limit=EMBED_DESCRIPTION_LIMIT):
+	chunks = []
+	current = ""
+	for part in text.split("\n\n"):
+		while len(part) > limit:
+			if current:
+				chunks.append(current)
+				current = ""
+			chunks.append(part[:limit])
+			part = part[limit:]
+		candidate = f"{current}\n\n{part}" if current else part
+		if len(candidate) > limit:
+			chunks.append(current)
+			current = part
+		else:
+			current = candidate
+	if current or not chunks:
+		chunks.append(current)
+	return chunks
+
+def build_block_embeds(kind, title, entries):
+	if kind == "no_class":
+		embed_title = f"**{title} - Zastępstwa z nieprzypisanymi klasami! (:exclamation:)**"
+		suffix = "\n### Informacja o tej wiadomości:\nTe zastępstwa nie posiadają dołączonej klasy, więc zweryfikuj czy przypadkiem nie dotyczą one Ciebie!"
+	else:
+		embed_title = f"**{title}**"
+		suffix = ""
+
+	# Zbyt długie opisy są dzielone na kolejne embedy tego samego nauczyciela
+	chunks = split_description(render_substitutions(entries), EMBED_DESCRIPTION_LIMIT - len(suffix))
+	chunks[-1] += suffix
+	embeds = [
+		discord.Embed(
+			title=(embed_title if index == 0 else f"{embed_title} (cd.)")[:EMBED_TITLE_LIMIT],
+			description=chunk,
+			color=EMBEDS_COLOR
+		)
+		for index, chunk in enumerate(chunks)
+	]
+	embeds[-1].set_footer(text="Każdy kolejny nauczyciel, za którego wpisywane są zastępstwa, jest załączany w oddzielnym embedzie.")
+	return embeds
+
+def pack_embeds(embeds):
+	packs = []
+	current_pack = []
+	current_size = 0
+	for embed in embeds:
+		embed_size = len(embed)
+		if current_pack and (len(current_pack) >= MESSAGE_EMBEDS_LIMIT or current_size + embed_size > MESSAGE_CHARACTERS_LIMIT):
+			packs.append(current_pack)
+			current_pack = []
+			current_size = 0
+		current_pack.append(embed)
+		current_size += embed_size
+	if current_pack:
+		packs.append(current_pack)
+	return packs
+
+def serialize_embed(embed):
+	return json.dumps(embed.to_dict(), sort_keys=True, ensure_ascii=False)
+
+def calculate_pack_fingerprint(pack, serialized_embeds=None):
+	# Złączenie zapisanych embedów daje ten sam tekst co zapis całej listy, więc odciski wcześniej wysłanych wiadomości pozostają aktualne
+	serialized_embeds = serialized_embeds or {}
+	return calculate_fingerprint("[" + ", ".join(serialized_embeds.get(id(embed)) or serialize_embed(embed) for embed in pack) + "]")
+
+# Wysyłanie przez webhooki
+# Kanał webhooka udostępnia te same metody co kanał tekstowy, dzięki czemu send_updates i deliver_message działają w obu trybach
+class WebhookPartialMessage:
+	def __init__(self, channel, message_id):
+		self.channel = channel
+		self.id = message_id
+
+	async def edit(self, **kwargs):
+		return await self.channel.webhook.edit_message(self.id, **kwargs)
+
+	async def delete(self, delay=None):
+		if delay is not None:
+			await asyncio.sleep(delay)
+		await self.channel.webhook.delete_message(self.id)
+
+	async def add_reaction(self, emoji):
+		# Webhook nie może dodawać reakcji, więc dodaje je konto bota
+		await self.channel.channel.get_partial_message(self.id).add_reaction(emoji)
+
+class WebhookChannel:
+	def __init__(self, guild_id, channel, webhook):
+		self.guild_id = guild_id
+		self.channel = channel
+		self.webhook = webhook
+		self.id = channel.id
+
+	async def send(self, content=None, **kwargs):
+		try:
+			return await self.webhook.send(content=content, wait=True, **kwargs)
+		except discord.NotFound:
+			# Usunięty webhook jest zapominany, a kolejne aktualizacje wysyła konto bota do czasu ponownego użycia komendy /skonfiguruj
+			console_logger.warning(f"Webhook kanału {self.id} serwera {self.guild_id} został usunięty. Zastępstwa będą wysyłane przez konto bota.")
+			config_service.clear_webhook(self.guild_id)
+			webhook_sender.webhooks.pop(self.webhook.url, None)
+			raise
+
+	def get_partial_message(self, message_id):
+		return WebhookPartialMessage(self, message_id)
+
+class WebhookSender:
+	def __init__(self, limit):
+		# Wszystkie webhooki korzystają ze wspólnej puli połączeń, a limity zapytań każdego webhooka obsługuje discord.py
+		self.session = HttpSession(limit)
+		self.webhooks = {}
+
+	def get_channel(self, guild_id, channel):
+		if not WEBHOOK_DELIVERY:
+			return channel
+		webhook_data = config_service.get_guild(guild_id).get("webhook")
+		if not webhook_data or webhook_data.get("channel_id") != str(channel.id):
+			return channel
+		webhook = self.webhooks.get(webhook_data["url"])
+		if webhook is None:
+			webhook = self.webhooks[webhook_data["url"]] = discord.Webhook.from_url(webhook_data["url"], session=self.session.get())
+		return WebhookChannel(guild_id, channel, webhook)
+
+	async def close(self):
+		self.webhooks.clear()
+		await self.session.close()
+
+webhook_sender = WebhookSender(WEBHOOK_CONCURRENCY)
+
+async def ensure_channel_webhook(guild_id, channel):
+	# Webhook jest tworzony raz dla kanału, a jego adres zapisywany w konfiguracji serwera
+	webhook_data = config_service.get_guild(guild_id).get("webhook")
+	if webhook_data and webhook_data.get("channel_id") == str(channel.id):
+		return True
+	try:
+		webhook = next((webhook for webhook in await channel.webhooks() if webhook.user and webhook.user.id == bot.user.id and webhook.token), None)
+		if webhook is None:
+			webhook = await channel.create_webhook(name=bot.user.name, reason="Wysyłanie aktualizacji zastępstw")
+	except discord.DiscordException as e:
+		console_logger.warning(f"Nie udało się utworzyć webhooka na kanale {channel.id} serwera {guild_id}. Zastępstwa będą wysyłane przez konto bota. Więcej informacji: {e}")
+		config_service.clear_webhook(guild_id)
+		return False
+	config_service.set_webhook(guild_id, channel.id, webhook.url)
+	console_logger.info(f"Utworzono webhook {webhook.id} na kanale {channel.id} serwera {guild_id}.")
+	return True
+
+async def deliver_message(channel, message_id, **kwargs):
+	# Wcześniej wysłana wiadomość jest edytowana, a nowa wysyłana tylko wtedy, gdy poprzedniej już nie ma
+	if message_id:
+		try:
+			message = await channel.get_partial_message(int(message_id)).edit(**kwargs)
+			metrics.increment("messages_total", operation="edit")
+			return message, False
+		except discord.NotFound:
+			console_logger.warning(f"Nie znaleziono wiadomości z ID {message_id}. Wysyłanie nowej wiadomości.")
+	message = await channel.send(**kwargs)
+	metrics.increment("messages_total", operation="send")
+	return message, True
+
+async def remove_message(channel, message_id):
+	try:
+		await channel.get_partial_message(int(message_id)).delete()
+		metrics.increment("messages_total", operation="delete")
+	except discord.NotFound:
+		pass
+
+async def send_updates(channel, diff, rendered, current_time, messages):
+	additional_info = rendered.additional_info
+	blocks = rendered.blocks
+	description_only_for_additional_info = f"**Dodatkowe informacje zastępstw:**\n{additional_info}\n\n**Informacja o tej wiadomości:**\nW tej wiadomości znajdują się informacje dodatkowe, które zostały umieszczone przed zastępstwami. Nie znaleziono dla twojej klasy żadnych nowych zastępstw, więc nie dostaniesz powiadomienia."
+	description_for_additional_info = f"**Dodatkowe informacje zastępstw:**\n{additional_info}\n\n**Informacja o tej wiadomości:**\nW tej wiadomości znajdują się informacje dodatkowe, które zostały umieszczone przed zastępstwami. Wszystkie zastępstwa znajdują się pod tą wiadomością."
 
-			for teacher, entries in no_class_entries_by_teacher.items():
-				embed = discord.Embed(
-					title=f"**{teacher} - Zastępstwa z nieprzypisanymi klasami! (:exclamation:)**",
-					description="\n\n".join(entries) + description_for_entries,
-					color=EMBEDS_COLOR
-				)
-				embed.set_footer(text="Każdy kolejny nauczyciel, za którego wpisywane są zastępstwa, jest załączany w oddzielnej wiadomości.")
-				await channel.send(embed=embed)
+	# Wiadomości są zapamiętywane na bieżący dzień; nowego dnia lub po zmianie kanału wszystko jest wysyłane od nowa
+	today = datetime.now(TIMEZONE).strftime("%d-%m-%Y")
+	changed_blocks = diff.changed_blocks
+	# Wiadomości wysłane przez konto bota nie mogą być edytowane przez webhook i odwrotnie, więc zmiana sposobu wysyłania również rozpoczyna je od nowa
+	webhook_id = str(channel.webhook.id) if isinstance(channel, WebhookChannel) else None
+	if messages.get("date") != today or messages.get("channel_id") != str(channel.id) or messages.get("webhook_id") != webhook_id or "packs" not in messages:
+		messages.clear()
+		messages.update({"date": today, "channel_id": str(channel.id), "webhook_id": webhook_id, "packs": []})
+		changed_blocks = list(blocks)
 
-		elif (additional_info and current_entries) or (current_entries):
+	try:
+		last_message = None
+		if changed_blocks:
 			ping_message = "@everyone Zastępstwa zostały zaktualizowane!"
 			ping_msg = await channel.send(ping_message)
-			await asyncio.sleep(5)
-			await ping_msg.delete()
+			# Powiadomienie jest usuwane w tle, nie wstrzymując wysyłania kolejnych wiadomości
+			await ping_msg.delete(delay=5)
+			metrics.increment("messages_total", operation="send")
+			metrics.increment("messages_total", operation="delete")
+			description = description_for_additional_info + describe_changes(diff)
+		else:
+			# Bez nowych lub zmienionych zastępstw aktualizowana jest wyłącznie wiadomość z podsumowaniem, bez powiadomienia
+			description = description_only_for_additional_info
+			if diff.removed_blocks:
+				description += describe_changes(diff)
+
+		header_embed = discord.Embed(
+			title="**Zastępstwa zostały zaktualizowane!**",
+			description=description,
+			color=EMBEDS_COLOR
+		)
+		header_embed.set_footer(text=f"Czas aktualizacji: {current_time}\nStworzone z ❤️ przez Kacpra Górkę!")
+
+		# Embedy są pakowane po kilka w jedną wiadomość, a edytowane są tylko wiadomości, których zawartość się zmieniła
+		# Embedy nauczycieli są wspólne dla wszystkich serwerów z tym samym filtrem, a osobny dla każdego serwera jest wyłącznie nagłówek
+		embeds = [header_embed, *rendered.get_block_embeds()]
+		packs = pack_embeds(embeds)
+
+		previous_packs = messages["packs"]
+		delivered_packs = []
+		for index, pack in enumerate(packs):
+			fingerprint = calculate_pack_fingerprint(pack, rendered.serialized_embeds)
+			previous_pack = previous_packs[index] if index < len(previous_packs) else None
+			if previous_pack and previous_pack["hash"] == fingerprint:
+				delivered_packs.append(previous_pack)
+				continue
 
-			embed = discord.Embed(
-				title="**Zastępstwa zostały zaktualizowane!**",
-				description=description_for_additional_info,
-				color=EMBEDS_COLOR
-			)
-			embed.set_footer(text=f"Czas aktualizacji: {current_time}\nStworzone z ❤️ przez Kacpra Górkę!")
-			await channel.send(embed=embed)
-
-			if no_class_entries_by_teacher:
-				for teacher, entries in no_class_entries_by_teacher.items():
-					embed = discord.Embed(
-						title=f"**{teacher} - Zastępstwa z nieprzypisanymi klasami! (:exclamation:)**",
-						description="\n\n".join(entries) + description_for_entries,
-						color=EMBEDS_COLOR
-					)
-					embed.set_footer(text="Każdy kolejny nauczyciel, za którego wpisywane są zastępstwa, jest załączany w oddzielnej wiadomości.")
-					await channel.send(embed=embed)
+			message, created = await deliver_message(channel, previous_pack and previous_pack["id"], embeds=pack)
+			delivered_packs.append({"id": str(message.id), "hash": fingerprint})
+			messages["packs"] = delivered_packs + previous_packs[index + 1:]
+			if created:
+				last_message = message
 
-			for title, entries in current_entries:
-				embed = discord.Embed(
-					title=f"**{title}**",
-					description="\n\n".join(entries),
-					color=EMBEDS_COLOR
-				)
-				embed.set_footer(text="Każdy kolejny nauczyciel, za którego wpisywane są zastępstwa, jest załączany w oddzielnej wiadomości.")
-				last_message = await channel.send(embed=embed)
+		# Nadmiarowe wiadomości z poprzedniej aktualizacji są usuwane
+		surplus_packs = previous_packs[len(packs):]
+		messages["packs"] = delivered_packs + surplus_packs
+		while surplus_packs:
+			await remove_message(channel, surplus_packs[0]["id"])
+			surplus_packs = surplus_packs[1:]
+			messages["packs"] = delivered_packs + surplus_packs
 
 		if last_message:
-			await last_message.add_reaction("❤️")
+			await channel.get_partial_message(last_message.id).add_reaction("❤️")
 
 	except discord.DiscordException as e:
 		console_logger.error(f"Błąd podczas wysyłania wiadomości: {e}")
 		raise
 
+# Wysyłanie wiadomości prywatnych do subskrybentów
+class DirectMessage(NamedTuple):
+	source: Source
+	parsed: ParsedSubstitutions
+	classes: set
+	changed_classes: set
+
+def build_direct_message_embeds(message):
+	entries, _ = filter_entries(message.parsed, message.classes)
+	description = f"Zmieniły się zastępstwa klas: {', '.join(f'**{cls}**' for cls in sorted(message.changed_classes))}."
+	if not entries:
+		description += "\nObecnie brak zastępstw dla subskrybowanych przez Ciebie klas."
+	embed = discord.Embed(title=f"**Aktualizacja zastępstw - {message.source.name}**"[:EMBED_TITLE_LIMIT], description=description, color=EMBEDS_COLOR)
+	embed.set_footer(text="Subskrypcję możesz zmienić lub anulować, używając komendy /subskrybuj.")
+
+	embeds = [embed]
+	for title, records in entries:
+		embeds.extend(build_block_embeds("entries", title, records))
+	return pack_embeds(embeds)
+
+class DirectMessageQueue:
+	def __init__(self, concurrency, rate_limit):
+		self.concurrency = concurrency
+		self.rate_limit = rate_limit
+		self.queue = None
+		self.pending = {}
+		self.workers = []
+		self.next_send_time = 0
+
+	def start(self):
+		if self.workers:
+			return
+		self.queue = asyncio.Queue()
+		self.workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+
+	def put(self, user_id, source, parsed, classes, changed_classes):
+		self.start()
+		# Użytkownik oczekujący już w kolejce otrzyma jedną wiadomość z najnowszymi zastępstwami zamiast kilku kolejnych
+		previous = self.pending.get(user_id)
+		if previous is not None:
+			changed_classes = previous.changed_classes | changed_classes
+			metrics.increment("direct_messages_total", result="coalesced")
+		self.pending[user_id] = DirectMessage(source, parsed, set(classes), set(changed_classes))
+		if previous is None:
+			self.queue.put_nowait(user_id)
+
+	async def wait_for_slot(self):
+		# Zapytania są rozkładane równomiernie w czasie, aby nie przekroczyć globalnego limitu Discorda
+		loop = asyncio.get_running_loop()
+		now = loop.time()
+		send_time = max(now, self.next_send_time)
+		self.next_send_time = send_time + 1 / self.rate_limit
+		if send_time > now:
+			await asyncio.sleep(send_time - now)
+
+	async def worker(self):
+		while True:
+			user_id = await self.queue.get()
+			try:
+				message = self.pending.pop(user_id, None)
+				if message is not None:
+					await self.send(user_id, message)
+			except Exception as e:
+				console_logger.error(f"Błąd podczas wysyłania wiadomości prywatnej do użytkownika {user_id}: {e}")
+				metrics.increment("direct_messages_total", result="failed")
+			finally:
+				self.queue.task_done()
+
+	async def send(self, user_id, message):
+		user = bot.get_user(int(user_id))
+		try:
+			if user is None:
+				await self.wait_for_slot()
+				user = await bot.fetch_user(int(user_id))
+			if user.dm_channel is None:
+				# Kanał wiadomości prywatnych jest tworzony osobnym zapytaniem, które również wlicza się do limitu
+				await self.wait_for_slot()
+				await user.create_dm()
+			for embeds in build_direct_message_embeds(message):
+				await self.wait_for_slot()
+				await user.send(embeds=embeds)
+			metrics.increment("direct_messages_total", result="sent")
+		except discord.NotFound:
+			console_logger.info(f"Nie znaleziono użytkownika {user_id}. Usuwanie jego subskrypcji.")
+			await subscription_service.unsubscribe(user_id)
+			metrics.increment("direct_messages_total", result="not_found")
+		except discord.Forbidden:
+			console_logger.info(f"Użytkownik {user_id} nie przyjmuje wiadomości prywatnych od bota.")
+			metrics.increment("direct_messages_total", result="forbidden")
+
+	def shutdown(self):
+		for worker in self.workers:
+			worker.cancel()
+		self.workers = []
+
+direct_message_queue = DirectMessageQueue(DM_CONCURRENCY, DM_RATE_LIMIT)
+
 # Logowanie komend
 def log_command(interaction: discord.Interaction, success: bool, error_message: str = None):
 	status = "pomyślnie" if success else "niepomyślnie"
@@ -446,27 +2238,49 @@ def log_command(interaction: discord.Interaction, success: bool, error_message:
 	commands_logger.info(log_message)
 
 # /skonfiguruj
+GRADE_LABELS = {
+	"1": ("Klasy pierwsze", "Wybierz kategorię z klasami pierwszymi"),
+	"2": ("Klasy drugie", "Wybierz kategorię z klasami drugimi"),
+	"3": ("Klasy trzecie", "Wybierz kategorię z klasami trzecimi"),
+	"4": ("Klasy czwarte", "Wybierz kategorię z klasami czwartymi"),
+	"5": ("Klasy piąte", "Wybierz kategorię z klasami piątymi")
+}
+
 class ClassGroupSelect(discord.ui.Select):
+	detail_description = "Teraz wybierz klasy, których zastępstwa mają być wysyłane na wybrany przez ciebie kanał."
+
 	def __init__(self, classes_by_grade):
-		options = [
-			discord.SelectOption(label="Klasy pierwsze", value="1", description="Wybierz kategorię z klasami pierwszymi"),
-			discord.SelectOption(label="Klasy drugie", value="2", description="Wybierz kategorię z klasami drugimi"),
-			discord.SelectOption(label="Klasy trzecie", value="3", description="Wybierz kategorię z klasami trzecimi"),
-			discord.SelectOption(label="Klasy czwarte", value="4", description="Wybierz kategorię z klasami czwartymi"),
-			discord.SelectOption(label="Klasy piąte", value="5", description="Wybierz kategorię z klasami piątymi"),
-		]
-		super().__init__(placeholder="Wybierz kategorie", min_values=1, max_values=3, options=options)
-		self.classes_by_grade = classes_by_grade
+		# Kategorie zależą od klas szkoły, do której przypisany jest serwer, a kategorie z większą liczbą klas niż limit selektora są dzielone na części
+		options = []
+		self.class_groups = {}
+		for grade, classes in classes_by_grade.items():
+			label, description = GRADE_LABELS.get(grade, (f"Klasy {grade}", f"Wybierz kategorię z klasami {grade}"))
+			parts = [classes[index:index + SELECT_OPTIONS_LIMIT] for index in range(0, len(classes), SELECT_OPTIONS_LIMIT)]
+			for index, part in enumerate(parts):
+				value = f"{grade}:{index}"
+				self.class_groups[value] = part
+				options.append(discord.SelectOption(label=label if len(parts) == 1 else f"{label} ({index + 1}/{len(parts)})", value=value, description=description))
+		options = options[:SELECT_OPTIONS_LIMIT]
+
+		# Liczba kategorii do wybrania jest ograniczona tak, aby nawet największe z nich zmieściły się w selektorze klas
+		group_sizes = sorted((len(self.class_groups[option.value]) for option in options), reverse=True)
+		max_values = 1
+		while max_values < min(3, len(group_sizes)) and sum(group_sizes[:max_values + 1]) <= SELECT_OPTIONS_LIMIT:
+			max_values += 1
+		super().__init__(placeholder="Wybierz kategorie", min_values=1, max_values=max_values, options=options)
+
+	def build_detail_view(self, classes):
+		return ClassDetailView(classes)
 
 	async def callback(self, interaction: discord.Interaction):
 		all_classes = []
-		for grade in self.values:
-			all_classes.extend(self.classes_by_grade.get(grade, []))
+		for value in self.values:
+			all_classes.extend(self.class_groups.get(value, []))
 		
-		view = ClassDetailView(all_classes)
+		view = self.build_detail_view(all_classes)
 		embed = discord.Embed(
 			title="**Dalsza konfiguracja**",
-			description="Teraz wybierz klasy, których zastępstwa mają być wysyłane na wybrany przez ciebie kanał.",
+			description=self.detail_description,
 			color=EMBEDS_COLOR
 			)
 		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
@@ -483,12 +2297,8 @@ class ClassDetailSelect(discord.ui.Select):
 
 	async def callback(self, interaction: discord.Interaction):
 		guild_id = str(interaction.guild.id)
-		channel_id = guild_config.get(guild_id, {}).get("channel_id")
-		
-		if guild_id not in guild_config:
-			guild_config[guild_id] = {}
-		guild_config[guild_id]["selected_classes"] = self.values
-		save_config(config)
+		channel_id = config_service.get_guild(guild_id).get("channel_id")
+		config_service.set_selected_classes(guild_id, self.values)
 
 		embed = discord.Embed(title="**Podsumowanie Twoich wyborów**", color=EMBEDS_COLOR)
 		if channel_id:
@@ -517,13 +2327,11 @@ class ClearFilterButton(discord.ui.Button):
 
 	async def callback(self, interaction: discord.Interaction):
 		guild_id = str(interaction.guild.id)
-		if guild_id in guild_config:
-			guild_config[guild_id].pop("selected_classes", None)
-			save_config(config)
+		config_service.clear_selected_classes(guild_id)
 
 		embed = discord.Embed(title="**Podsumowanie Twoich wyborów**", color=EMBEDS_COLOR)
-		if "channel_id" in guild_config.get(guild_id, {}):
-			channel_id = guild_config[guild_id]["channel_id"]
+		channel_id = config_service.get_guild(guild_id).get("channel_id")
+		if channel_id:
 			channel = interaction.guild.get_channel(int(channel_id))
 			embed.add_field(name="Wybrany kanał:", value=channel.mention if channel else "**Nie znaleziono kanału**")
 		else:
@@ -559,7 +2367,7 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
 			log_command(interaction, success=False, error_message="Brak uprawnień.")
 			return
 
-		if str(interaction.guild.id) not in config.get("allowed_guilds", []):
+		if not config_service.is_guild_allowed(interaction.guild.id):
 			embed = discord.Embed(
 				title="**Polecenie nie zostało wykonane!**",
 				description="Nie masz uprawnień do używania tej komendy na tym serwerze, skontaktuj się z administratorem bota. Wszystkie potrzebne informacje znajdziesz, używając komendy `/informacje`.",
@@ -571,10 +2379,10 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
 			log_command(interaction, success=False, error_message="Ten serwer nie znajduje się na liście dozwolonych serwerów.")
 			return
 
-		guild_config.setdefault(str(interaction.guild.id), {})["channel_id"] = str(channel.id)
-		save_config(config)
+		config_service.set_channel(interaction.guild.id, channel.id)
 
-		view = ClassView(classes_by_grade)
+		source = get_guild_source(interaction.guild.id) or sources[DEFAULT_SOURCE]
+		view = ClassView(source.classes_by_grade)
 		embed = discord.Embed(
 			title="**Ważna informacja! (:exclamation:)**",
 			description="Teraz musisz dokonać wyboru, czy chcesz dostawać zastępstwa dla wszystkich klas, czy może dla klas wybranych przez Ciebie. Jeżeli postanowiłeś, że chcesz wybrać niestandardowe klasy, wybierz kategorie z ich przedziałem, w przeciwnym razie naciśnij przycisk.",
@@ -587,19 +2395,133 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
 			view=view
 			)
 		log_command(interaction, success=True)
+
+		# Webhook tworzony jest dopiero po odpowiedzi na komendę, aby nie przekroczyć czasu na odpowiedź
+		if WEBHOOK_DELIVERY and not await ensure_channel_webhook(interaction.guild.id, channel):
+			embed = discord.Embed(
+				title="**Nie udało się utworzyć webhooka! (:exclamation:)**",
+				description="Bot nie mógł utworzyć webhooka na wybranym kanale, więc zastępstwa będą wysyłane przez konto bota. Nadaj botowi uprawnienie do zarządzania webhookami, a następnie ponownie użyj komendy `/skonfiguruj`.",
+				color=EMBEDS_COLOR
+				)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.followup.send(embed=embed, ephemeral=True)
 		
 	except Exception as e:
 		log_command(interaction, success=False, error_message=str(e))
 		await interaction.response.send_message(f"Wystąpił błąd: {str(e)}", ephemeral=True)
 		raise
 
+# /subskrybuj
+def describe_subscription(subscription):
+	if not subscription:
+		return "**Brak**"
+	source_id, classes = subscription
+	source = sources.get(source_id)
+	return f"{', '.join(f'**{cls}**' for cls in sorted(classes))}\n({source.name if source else source_id})"
+
+class SubscriptionGroupSelect(ClassGroupSelect):
+	detail_description = "Teraz wybierz klasy, o których zmianach w zastępstwach chcesz otrzymywać wiadomości prywatne."
+
+	def __init__(self, source):
+		super().__init__(source.classes_by_grade)
+		self.source = source
+
+	def build_detail_view(self, classes):
+		view = discord.ui.View()
+		view.add_item(SubscriptionClassSelect(self.source, classes))
+		return view
+
+class SubscriptionClassSelect(discord.ui.Select):
+	def __init__(self, source, classes):
+		options = [discord.SelectOption(label=cls, value=cls) for cls in classes]
+		super().__init__(placeholder="Wybierz klasy", min_values=1, max_values=len(classes), options=options)
+		self.source = source
+
+	async def callback(self, interaction: discord.Interaction):
+		await subscription_service.subscribe(interaction.user.id, self.source.id, self.values)
+
+		embed = discord.Embed(
+			title="**Podsumowanie Twoich wyborów**",
+			description="Po każdej zmianie zastępstw wybranych klas otrzymasz wiadomość prywatną z ich aktualną listą. Upewnij się, że masz włączone wiadomości prywatne od członków tego serwera.",
+			color=EMBEDS_COLOR
+			)
+		embed.add_field(name="Subskrybowane klasy:", value=describe_subscription(subscription_service.get(interaction.user.id)))
+		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+		await interaction.response.edit_message(
+			embed=embed,
+			view=None
+		)
+
+class UnsubscribeButton(discord.ui.Button):
+	def __init__(self):
+		super().__init__(label="Anuluj subskrypcję", style=discord.ButtonStyle.secondary)
+
+	async def callback(self, interaction: discord.Interaction):
+		await subscription_service.unsubscribe(interaction.user.id)
+
+		embed = discord.Embed(title="**Podsumowanie Twoich wyborów**", color=EMBEDS_COLOR)
+		embed.add_field(name="Subskrybowane klasy:", value="**Brak**")
+		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+		await interaction.response.edit_message(
+			embed=embed,
+			view=None
+		)
+
+class SubscriptionView(discord.ui.View):
+	def __init__(self, source):
+		super().__init__()
+		self.add_item(SubscriptionGroupSelect(source))
+		self.add_item(UnsubscribeButton())
+
+@bot.tree.command(name="subskrybuj", description="Otrzymuj wiadomości prywatne o zmianach zastępstw wybranych klas.")
+async def subskrybuj(interaction: discord.Interaction):
+	try:
+		if not config_service.is_guild_allowed(interaction.guild.id):
+			embed = discord.Embed(
+				title="**Polecenie nie zostało wykonane!**",
+				description="Nie masz uprawnień do używania tej komendy na tym serwerze, skontaktuj się z administratorem bota. Wszystkie potrzebne informacje znajdziesz, używając komendy `/informacje`.",
+				color=EMBEDS_COLOR
+				)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.response.send_message(embed=embed, ephemeral=True)
+			log_command(interaction, success=False, error_message="Ten serwer nie znajduje się na liście dozwolonych serwerów.")
+			return
+
+		# Subskrypcja dotyczy szkoły serwera, na którym użyto komendy
+		subscription_service.refresh()
+		source = get_guild_source(interaction.guild.id) or sources[DEFAULT_SOURCE]
+		view = SubscriptionView(source)
+		embed = discord.Embed(
+			title="**Subskrypcja zastępstw**",
+			description=f"Wybierz kategorie z klasami szkoły {source.name}, o których zmianach w zastępstwach chcesz otrzymywać wiadomości prywatne. Wybór zastępuje dotychczasową subskrypcję, a naciśnięcie przycisku ją anuluje.",
+			color=EMBEDS_COLOR
+			)
+		embed.add_field(name="Obecnie subskrybowane klasy:", value=describe_subscription(subscription_service.get(interaction.user.id)))
+		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+		await interaction.response.send_message(
+			embed=embed,
+			view=view,
+			ephemeral=True
+			)
+		log_command(interaction, success=True)
+
+	except Exception as e:
+		log_command(interaction, success=False, error_message=str(e))
+		await interaction.response.send_message(f"Wystąpił błąd: {str(e)}", ephemeral=True)
+		raise
+
 # /zarządzaj
 @bot.tree.command(name="zarządzaj", description="Dodaj lub usuń serwer z listy dozwolonych serwerów.")
-@app_commands.describe(dodaj_id="ID serwera, który chcesz dodać do listy dozwolonych serwerów.", usun_id="ID serwera, który chcesz usunąć z listy dozwolonych serwerów.")
-async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str = None, usun_id: str = None):
+@app_commands.describe(dodaj_id="ID serwera, który chcesz dodać do listy dozwolonych serwerów.", usun_id="ID serwera, który chcesz usunąć z listy dozwolonych serwerów.", szkola="Szkoła, której zastępstwa będą wysyłane na dodawany serwer. Podanie jej dla dodanego już serwera zmienia jego szkołę.")
+async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str = None, usun_id: str = None, szkola: str = None):
 	try:
 		# Sprawdza, czy użytkownik jest na liście dozwolonych użytkowników
-		if str(interaction.user.id) not in config.get("allowed_users", []):
+		if not config_service.is_user_allowed(interaction.user.id):
 			embed = discord.Embed(
 				title="**Polecenie nie zostało wykonane!**",
 				description="Nie masz uprawnień do używania tej komendy, tej komendy może użyć wyłącznie uprawniona osoba. Jeżeli jesteś administartorem serwera i chcesz skonfigurować bota, użyj komendy `/skonfiguruj`. Jeżeli uważasz, że wystąpił błąd, skontaktuj się z administratorem bota. Wszystkie potrzebne informacje znajdziesz, używając komendy `/informacje`.",
@@ -651,9 +2573,34 @@ async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str =
 			log_command(interaction, success=False, error_message="Nieprawidłowe ID serwera.")
 			return
 
+		# Sprawdza, czy podana szkoła istnieje
+		if szkola and szkola not in sources:
+			embed = discord.Embed(
+				title="**Polecenie nie zostało wykonane!**",
+				description=f"Podana szkoła (`{szkola}`) nie istnieje. Wybierz jedną ze szkół podpowiadanych przez komendę.",
+				color=EMBEDS_COLOR
+				)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.response.send_message(embed=embed)
+			log_command(interaction, success=False, error_message="Nieznana szkoła.")
+			return
+
 		# Obsługa dodania ID serwera
 		if dodaj_id and not usun_id:
-			if dodaj_id in config.get("allowed_guilds", []):
+			if config_service.is_guild_allowed(dodaj_id) and szkola:
+				config_service.set_source(dodaj_id, szkola)
+
+				embed = discord.Embed(
+					title="**Polecenie wykonane pomyślnie!**",
+					description=f"Serwer o ID `{dodaj_id}` otrzymuje od teraz zastępstwa szkoły **{sources[szkola].name}**.",
+					color=EMBEDS_COLOR
+					)
+				embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+				await interaction.response.send_message(embed=embed)
+				log_command(interaction, success=True)
+			elif config_service.is_guild_allowed(dodaj_id):
 				embed = discord.Embed(
 					title="**Polecenie nie zostało wykonane!**",
 					description="Wykonana operacja jest niepoprawna. Ten serwer znajduję się już na liście dozwolonych serwerów.",
@@ -664,13 +2611,12 @@ async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str =
 				await interaction.response.send_message(embed=embed)
 				log_command(interaction, success=False, error_message="Ten serwer znajduję się już na liście dozwolonych serwerów.")
 			else:
-				config["allowed_guilds"].append(dodaj_id)
-				config["guilds"][dodaj_id] = {"channel_id": None, "selected_classes": []}
-				save_config(config)
+				source_id = szkola or DEFAULT_SOURCE
+				config_service.add_guild(dodaj_id, source_id)
 
 				embed = discord.Embed(
 					title="**Polecenie wykonane pomyślnie!**",
-					description=f"Serwer o ID `{dodaj_id}` został pomyślnie dodany do listy dozwolonych serwerów.",
+					description=f"Serwer o ID `{dodaj_id}` został pomyślnie dodany do listy dozwolonych serwerów i otrzymuje zastępstwa szkoły **{sources[source_id].name}**.",
 					color=EMBEDS_COLOR
 					)
 				embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
@@ -680,7 +2626,7 @@ async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str =
 
 		# Obsługa usunięcia ID serwera
 		if usun_id and not dodaj_id:
-			if usun_id not in config.get("allowed_guilds", []):
+			if not config_service.is_guild_allowed(usun_id):
 				embed = discord.Embed(
 					title="**Polecenie nie zostało wykonane!**",
 					description="Wykonana operacja jest niepoprawna. Ten serwer nie znajduje się na liście dozwolonych serwerów.",
@@ -691,9 +2637,7 @@ async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str =
 				await interaction.response.send_message(embed=embed)
 				log_command(interaction, success=False, error_message="Ten serwer nie znajduje się na liście dozwolonych serwerów.")
 			else:
-				config["allowed_guilds"].remove(usun_id)
-				config["guilds"].pop(usun_id, None)
-				save_config(config)
+				config_service.remove_guild(usun_id)
 
 				embed = discord.Embed(
 					title="**Polecenie wykonane pomyślnie!**",
@@ -710,6 +2654,167 @@ async def add_or_remove_server(interaction: discord.Interaction, dodaj_id: str =
 		await interaction.response.send_message(f"Wystąpił błąd: {str(e)}", ephemeral=True)
 		raise
 
+@add_or_remove_server.autocomplete("szkola")
+async def source_autocomplete(interaction: discord.Interaction, current: str):
+	current = current.lower()
+	return [
+		app_commands.Choice(name=source.name[:100], value=source.id)
+		for source in sources.values()
+		if current in source.name.lower() or current in source.id.lower()
+		][:25]
+
+# /statystyki
+def format_duration_summary(name):
+	histogram = metrics.histogram(name)
+	if not histogram["count"]:
+		return "Brak pomiarów."
+	average = histogram["sum"] / histogram["count"]
+	return f"Ostatnio: **{histogram['last'] * 1000:.0f} ms**\nŚrednio: **{average * 1000:.0f} ms**\nMaksymalnie: **{histogram['max'] * 1000:.0f} ms**"
+
+@bot.tree.command(name="statystyki", description="Wyświetl statystyki działania bota.")
+async def statystyki(interaction: discord.Interaction):
+	try:
+		# Sprawdza, czy użytkownik jest na liście dozwolonych użytkowników
+		if not config_service.is_user_allowed(interaction.user.id):
+			embed = discord.Embed(
+				title="**Polecenie nie zostało wykonane!**",
+				description="Nie masz uprawnień do używania tej komendy, tej komendy może użyć wyłącznie uprawniona osoba. Jeżeli uważasz, że wystąpił błąd, skontaktuj się z administratorem bota. Wszystkie potrzebne informacje znajdziesz, używając komendy `/informacje`.",
+				color=EMBEDS_COLOR
+				)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.response.send_message(embed=embed, ephemeral=True)
+			log_command(interaction, success=False, error_message="Brak uprawnień.")
+			return
+
+		embed = discord.Embed(
+			title="**Statystyki działania bota**",
+			description=f"Statystyki zbierane są od ostatniego uruchomienia bota. Bot pracuje bez przerwy przez: {bot.get_uptime()}",
+			color=EMBEDS_COLOR
+			)
+		embed.add_field(name="Cykle sprawdzania:", value=f"Wszystkie: **{metrics.total('cycles_total')}**\nZ przetworzeniem strony: **{metrics.total('cycles_total', result='processed')}**\nBez zmian na stronie: **{metrics.total('cycles_total', result='unchanged')}**")
+		embed.add_field(name="Czas trwania cyklu:", value=format_duration_summary("cycle_duration_seconds"))
+		embed.add_field(name="Pobieranie strony:", value=f"Udane: **{metrics.total('fetches_total', status=200) + metrics.total('fetches_total', status=304)}**\nNieudane: **{metrics.total('fetches_total') - metrics.total('fetches_total', status=200) - metrics.total('fetches_total', status=304)}**")
+		embed.add_field(name="Czas pobierania strony:", value=format_duration_summary("fetch_duration_seconds"))
+		embed.add_field(name="Czas przetwarzania strony:", value=format_duration_summary("parse_duration_seconds"))
+		embed.add_field(name="Wyodrębnione wpisy:", value=f"**{metrics.gauge_total('entries_extracted')}**")
+		embed.add_field(name="Serwery:", value=f"Powiadomione: **{metrics.total('guilds_total', result='sent')}**\nBez zmian: **{metrics.total('guilds_total', result='unchanged')}**\nZ błędem: **{metrics.total('guilds_total', result='failed')}**")
+		embed.add_field(name="Wiadomości:", value=f"Wysłane: **{metrics.total('messages_total', operation='send')}**\nEdytowane: **{metrics.total('messages_total', operation='edit')}**\nUsunięte: **{metrics.total('messages_total', operation='delete')}**")
+		embed.add_field(name="Wiadomości prywatne:", value=f"Subskrybenci: **{subscription_service.count()}**\nWysłane: **{metrics.total('direct_messages_total', result='sent')}**\nPołączone: **{metrics.total('direct_messages_total', result='coalesced')}**\nNiedostarczone: **{metrics.total('direct_messages_total') - metrics.total('direct_messages_total', result='sent') - metrics.total('direct_messages_total', result='coalesced')}**")
+		embed.add_field(name="Limity zapytań Discorda:", value=f"Odpowiedzi 429: **{metrics.total('discord_rate_limits_total')}**")
+		embed.add_field(name="Opóźnienie pętli zdarzeń:", value=format_duration_summary("event_loop_lag_seconds"))
+		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+		await interaction.response.send_message(embed=embed, ephemeral=True)
+		log_command(interaction, success=True)
+
+	except Exception as e:
+		log_command(interaction, success=False, error_message=str(e))
+		await interaction.response.send_message(f"Wystąpił błąd: {str(e)}", ephemeral=True)
+		raise
+
+# /archiwum
+def describe_archived_change(source, text, previous_text):
+	# Obie wersje są porównywane tak samo jak przy wysyłaniu aktualizacji na serwer bez filtrowania klas
+	states = []
+	for version_text in (previous_text, text):
+		if version_text is None:
+			states.append({})
+			continue
+		parsed = parse_substitutions(version_text, source.teachers_cell_color, source.class_matcher)
+		entries, no_class_entries_by_teacher = filter_entries(parsed, [])
+		states.append(build_state(parsed.additional_info, entries, no_class_entries_by_teacher, build_blocks(entries, no_class_entries_by_teacher)))
+	diff = diff_states(*states)
+	teachers = sorted({key.split(":", 1)[1] or "Brak nauczyciela" for key in (*diff.changed_blocks, *diff.removed_blocks)})
+	description = describe_changes(diff).strip()
+	if diff.additional_info_changed:
+		description += "\nZmieniono dodatkowe informacje."
+	if teachers:
+		description += "\n\n**Zmiany dotyczą:**\n" + ", ".join(f"**{teacher}**" for teacher in teachers)
+	return description
+
+@bot.tree.command(name="archiwum", description="Przeglądaj archiwum wersji strony z zastępstwami.")
+@app_commands.describe(data="Dzień w formacie DD.MM.RRRR (domyślnie dzisiaj).", godzina="Godzina w formacie GG:MM, dla której zostaną pokazane zmiany.", nauczyciel="Pokaż wyłącznie wersje z zastępstwami za tego nauczyciela.", szkola="Szkoła, której archiwum chcesz przeglądać (domyślnie szkoła tego serwera).")
+async def archiwum(interaction: discord.Interaction, data: str = None, godzina: str = None, nauczyciel: str = None, szkola: str = None):
+	try:
+		# Sprawdza, czy użytkownik jest na liście dozwolonych użytkowników
+		if not config_service.is_user_allowed(interaction.user.id):
+			embed = discord.Embed(
+				title="**Polecenie nie zostało wykonane!**",
+				description="Nie masz uprawnień do używania tej komendy, tej komendy może użyć wyłącznie uprawniona osoba. Jeżeli uważasz, że wystąpił błąd, skontaktuj się z administratorem bota. Wszystkie potrzebne informacje znajdziesz, używając komendy `/informacje`.",
+				color=EMBEDS_COLOR
+				)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.response.send_message(embed=embed, ephemeral=True)
+			log_command(interaction, success=False, error_message="Brak uprawnień.")
+			return
+
+		source = sources.get(szkola) if szkola else get_guild_source(interaction.guild.id)
+		try:
+			day = datetime.strptime(data, "%d.%m.%Y").date() if data else datetime.now(TIMEZONE).date()
+			hour = datetime.strptime(godzina, "%H:%M").time() if godzina else None
+		except ValueError:
+			day = None
+		if snapshot_archive.connection is None or source is None or day is None:
+			if snapshot_archive.connection is None:
+				description = "Archiwum wersji strony jest wyłączone."
+			elif source is None:
+				description = "Podana szkoła nie istnieje. Wybierz jedną ze szkół podpowiadanych przez komendę."
+			else:
+				description = "Podana data lub godzina jest nieprawidłowa. Użyj formatu DD.MM.RRRR oraz GG:MM."
+			embed = discord.Embed(title="**Polecenie nie zostało wykonane!**", description=description, color=EMBEDS_COLOR)
+			embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+			await interaction.response.send_message(embed=embed, ephemeral=True)
+			log_command(interaction, success=False, error_message=description)
+			return
+
+		await interaction.response.defer(ephemeral=True)
+		versions, snapshots, size, compressed_size = await asyncio.to_thread(snapshot_archive.get_statistics)
+		embed = discord.Embed(title=f"**Archiwum strony szkoły {source.name}**"[:EMBED_TITLE_LIMIT], color=EMBEDS_COLOR)
+
+		if hour:
+			# Rozpakowywane są wyłącznie dwie porównywane wersje
+			moment = TIMEZONE.localize(datetime.combine(day, hour)).timestamp()
+			current, previous = await asyncio.to_thread(snapshot_archive.find_change_at, source.id, moment)
+			if current is None:
+				embed.description = f"Archiwum nie zawiera wersji strony sprzed {day.strftime('%d.%m.%Y')} {godzina}."
+			else:
+				text = await asyncio.to_thread(snapshot_archive.load, current[1])
+				previous_text = await asyncio.to_thread(snapshot_archive.load, previous[1]) if previous else None
+				changes = await asyncio.to_thread(describe_archived_change, source, text, previous_text)
+				fetched_at = datetime.fromtimestamp(current[0], TIMEZONE).strftime("%d.%m.%Y %H:%M:%S")
+				embed.description = f"Obowiązująca wersja strony została pobrana **{fetched_at}** (`{current[1][:12]}`).\n\n{changes}"[:EMBED_DESCRIPTION_LIMIT]
+		else:
+			day_versions = await asyncio.to_thread(snapshot_archive.find_versions, source.id, day.strftime("%Y-%m-%d"), nauczyciel)
+			teacher_info = f" z zastępstwami za **{nauczyciel}**" if nauczyciel else ""
+			if day_versions:
+				lines = [f"**{datetime.fromtimestamp(fetched_at, TIMEZONE).strftime('%H:%M:%S')}** `{content_hash[:12]}`" for fetched_at, content_hash in day_versions]
+				embed.description = f"Wersje strony z dnia **{day.strftime('%d.%m.%Y')}**{teacher_info}:\n" + "\n".join(lines[-50:])
+				embed.description += "\n\nAby zobaczyć zmiany w wybranej wersji, użyj tej komendy z opcją `godzina`."
+			else:
+				embed.description = f"Archiwum nie zawiera wersji strony z dnia **{day.strftime('%d.%m.%Y')}**{teacher_info}."
+
+		embed.add_field(name="Zapisane wersje:", value=f"**{versions}** (różnych treści: **{snapshots}**)")
+		embed.add_field(name="Rozmiar archiwum:", value=f"**{compressed_size / 1024 / 1024:.1f} MiB** (bez kompresji: **{size / 1024 / 1024:.1f} MiB**)")
+		embed.set_footer(text="Stworzone z ❤️ przez Kacpra Górkę!")
+
+		await interaction.followup.send(embed=embed, ephemeral=True)
+		log_command(interaction, success=True)
+
+	except Exception as e:
+		log_command(interaction, success=False, error_message=str(e))
+		if interaction.response.is_done():
+			await interaction.followup.send(f"Wystąpił błąd: {str(e)}", ephemeral=True)
+		else:
+			await interaction.response.send_message(f"Wystąpił błąd: {str(e)}", ephemeral=True)
+		raise
+
+@archiwum.autocomplete("szkola")
+async def archive_source_autocomplete(interaction: discord.Interaction, current: str):
+	return await source_autocomplete(interaction, current)
+
 # /informacje
 @bot.tree.command(name="informacje", description="Wyświetl najważniejsze informacje dotyczące bota.")
 async def informacje(interaction: discord.Interaction):
@@ -724,7 +2829,7 @@ async def informacje(interaction: discord.Interaction):
 		embed.add_field(name="Administratorzy bota:", value=BOT_ADMINISTRATORS)
 		embed.add_field(name="Ilość serwerów:", value=(f"Bot znajduję się na **{bot.get_server_count()}** serwerach."))
 		embed.add_field(name="Bot pracuje bez przerwy przez:", value=bot.get_uptime())
-		if str(interaction.guild.id) in config.get("allowed_guilds", []):
+		if config_service.is_guild_allowed(interaction.guild.id):
 			embed.add_field(name="Czy ten serwer jest dozwolony?", value=("Tak, jest."))
 		else:
 			embed.add_field(name="Czy ten serwer jest dozwolony?", value=("Nie, nie jest."))
@@ -738,7 +2843,26 @@ async def informacje(interaction: discord.Interaction):
 		raise
 
 # Uruchomienie bota
-if not config.get("token"):
-	console_logger.error("Brak tokena bota. Ustaw TOKEN w pliku konfiguracyjnym.")
-	exit(1)
-bot.run(config.get("token"))
\ No newline at end of file
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Bot informujący o aktualizacji zastępstw.")
+	parser.add_argument("--tryb", choices=["bot", "poller", "shard"], default=RUN_MODE, help="Tryb pracy procesu (stała RUN_MODE).")
+	parser.add_argument("--shardy", type=int, nargs="+", default=SHARD_IDS, help="Shardy obsługiwane przez ten proces (stała SHARD_IDS). Wymaga ustawienia stałej SHARD_COUNT.")
+	arguments = parser.parse_args()
+	RUN_MODE = arguments.tryb
+
+	if RUN_MODE == "poller":
+		asyncio.run(run_poller())
+		exit(0)
+	if RUN_MODE == "shard" and not SHARD_COUNT:
+		console_logger.error("Tryb shard wymaga ustawienia stałej SHARD_COUNT.")
+		exit(1)
+	if arguments.shardy is not None:
+		if not SHARD_COUNT:
+			console_logger.error("Opcja --shardy wymaga ustawienia stałej SHARD_COUNT.")
+			exit(1)
+		bot.shard_ids = arguments.shardy
+	if not config_service.get("token"):
+		console_logger.error("Brak tokena bota. Ustaw TOKEN w pliku konfiguracyjnym.")
+		exit(1)
+	# Logi discord.py trafiają do kolejki logów bota, więc domyślny handler konsoli discord.py nie jest potrzebny
+	bot.run(config_service.get("token"), log_handler=None)
\ No newline at end of file